@@ -0,0 +1,147 @@
+"""Control de admisión: límite de ritmo por usuario y tope de peticiones simultáneas por worker.
+
+Middleware ASGI puro delante de los routers, en dos pasos:
+
+1. Cubeta de fichas (token bucket, app/ritmo.py) por usuario y clase de ruta. El usuario
+   sale del "sub" del JWT (solo se verifica la firma, sin ir a la base); sin token válido
+   se usa la IP. Al vaciarse la cubeta responde 429 con Retry-After. El login además se
+   limita por usuario dentro de POST /token, donde el formulario ya está leído.
+2. Tope de handlers en curso por worker (ADMISION_CONCURRENCIA). Las que exceden esperan
+   en cola hasta ADMISION_ESPERA_SEGUNDOS; con la cola llena (ADMISION_COLA) o si vence
+   la espera responde 503 con Retry-After. Así una ráfaga no se amontona frente al pool
+   de conexiones del motor de Prisma (DB_POOL_SIZE) hasta agotar sus timeouts.
+
+Los límites de ritmo son para todo el servicio y se reparten entre los workers; el tope
+de concurrencia es por worker. Los rechazos se cuentan en admision_rechazos_total{clase,
+motivo} (/metrics).
+"""
+import asyncio
+import os
+from typing import Optional
+
+import orjson
+from jose import JWTError, jwt
+from prometheus_client import Counter, Gauge
+
+from app.database import DB_POOL_SIZE
+from app.ritmo import Cubetas, limite, segundos_retry_after
+from app.routes.auth import ALGORITHM, SECRET_KEY
+
+# Handlers en curso por worker: algo más que el pool, para que el pool nunca quede ocioso
+ADMISION_CONCURRENCIA = int(os.getenv("ADMISION_CONCURRENCIA", str(DB_POOL_SIZE * 2)))
+ADMISION_COLA = int(os.getenv("ADMISION_COLA", "100"))
+ADMISION_ESPERA_SEGUNDOS = float(os.getenv("ADMISION_ESPERA_SEGUNDOS", "5"))
+ADMISION_CUBETAS_MAX = 10_000
+
+# Rutas que no pasan por el control: sondeos, documentación y flujos de larga duración
+EXENTAS = ("/metrics", "/docs", "/redoc", "/openapi.json", "/eventos/")
+
+RECHAZOS = Counter("admision_rechazos_total", "Peticiones rechazadas por el control de admisión", ["clase", "motivo"])
+ESPERANDO = Gauge("admision_esperando", "Peticiones esperando un lugar en el worker", multiprocess_mode="livesum")
+
+
+# Por usuario (o IP) para todo el servicio: ráfaga y por minuto, repartidos entre los workers.
+# RATE_LIMIT_<CLASE>="ráfaga/por_minuto" los cambia, p. ej. RATE_LIMIT_LISTADO="20/120".
+LIMITES = {
+    # Sin token la clave es la IP, y detrás de un NAT, CGNAT o proxy muchos vendedores comparten
+    # una: el límite es holgado. El freno por usuario del login está en POST /token (LIMITE_LOGIN).
+    "auth": limite("auth", 300, 1200),          # login, refresh y alta de usuarios
+    "lectura": limite("lectura", 60, 600),      # catálogos y lecturas puntuales
+    "listado": limite("listado", 20, 120),      # listados paginados, export, reportes, sync
+    "escritura": limite("escritura", 60, 300),
+}
+
+
+def clase_de(metodo: str, ruta: str) -> Optional[str]:
+    """Clase de la ruta según método y prefijo; None si la ruta está exenta."""
+    if metodo == "OPTIONS" or ruta.startswith(EXENTAS):
+        return None
+    if ruta.startswith("/token") or (ruta.rstrip("/") == "/users" and metodo == "POST"):
+        return "auth"
+    if metodo not in ("GET", "HEAD"):
+        return "escritura"
+    if ruta in ("/pedidos/", "/clientes/", "/detalle_pedidos/", "/pedidos/export", "/sync") or ruta.startswith("/reportes/"):
+        return "listado"
+    return "lectura"
+
+
+def identidad(scope) -> str:
+    """"u:<username>" si trae un access token con firma válida; si no, "ip:<dirección>"."""
+    for nombre, valor in scope["headers"]:
+        if nombre == b"authorization":
+            esquema, _, token = valor.decode("latin-1").partition(" ")
+            if esquema.lower() == "bearer" and token:
+                try:
+                    usuario = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+                except JWTError:
+                    usuario = None
+                if usuario:
+                    return f"u:{usuario}"
+            break
+    cliente = scope.get("client")
+    return f"ip:{cliente[0] if cliente else '-'}"
+
+
+async def _rechazar(send, codigo: int, detalle: str, reintentar: float):
+    cuerpo = orjson.dumps({"detail": detalle})
+    await send({
+        "type": "http.response.start",
+        "status": codigo,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(cuerpo)).encode()),
+            (b"retry-after", segundos_retry_after(reintentar).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+class AdmisionMiddleware:
+    def __init__(self, app, concurrencia: int = ADMISION_CONCURRENCIA, cola: int = ADMISION_COLA,
+                 espera: float = ADMISION_ESPERA_SEGUNDOS):
+        self.app = app
+        self.cubetas = Cubetas(ADMISION_CUBETAS_MAX)
+        self.lugares = asyncio.Semaphore(concurrencia)
+        self.cola = cola
+        self.espera = espera
+        self.esperando = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        clase = clase_de(scope["method"], scope["path"])
+        if clase is None:
+            await self.app(scope, receive, send)
+            return
+
+        reintentar = self.cubetas.tomar((identidad(scope), clase), LIMITES[clase])
+        if reintentar:
+            RECHAZOS.labels(clase, "limite").inc()
+            await _rechazar(send, 429, "Demasiadas peticiones", reintentar)
+            return
+
+        if self.lugares.locked():
+            # Sin lugar libre: se espera en cola, o se rechaza ya si la cola está llena
+            if self.esperando >= self.cola:
+                RECHAZOS.labels(clase, "cola_llena").inc()
+                await _rechazar(send, 503, "Servidor ocupado", 1)
+                return
+            self.esperando += 1
+            ESPERANDO.inc()
+            try:
+                await asyncio.wait_for(self.lugares.acquire(), timeout=self.espera)
+            except asyncio.TimeoutError:
+                RECHAZOS.labels(clase, "espera").inc()
+                await _rechazar(send, 503, "Servidor ocupado", self.espera)
+                return
+            finally:
+                self.esperando -= 1
+                ESPERANDO.dec()
+        else:
+            await self.lugares.acquire()
+        try:
+            # El lugar se libera al terminar de enviar la respuesta (incluye los export en streaming)
+            await self.app(scope, receive, send)
+        finally:
+            self.lugares.release()
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from fastapi import Request
+
+# Segundos máximos que un worker sirve el catálogo sin recargarlo, aunque nadie lo invalide
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+# Directorio compartido por los workers de gunicorn para avisarse de invalidaciones
+CATALOG_CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", os.path.join(tempfile.gettempdir(), "saporive-cache"))
+
+
+class CatalogSnapshot(NamedTuple):
+    rows: list
+    by_id: dict
+    etag: str
+    generation: int
+    loaded_at: float
+
+
+class CatalogCache:
+    """Copia en memoria de un catálogo pequeño (productos, asesores) por worker.
+
+    Cada invalidación toca un archivo de generación en CATALOG_CACHE_DIR; los demás
+    workers comparan su mtime en cada lectura (un stat, sin consulta a la base) y
+    recargan cuando cambió. El ETag se calcula del contenido, así que es el mismo en
+    todos los workers para los mismos datos.
+    """
+
+    def __init__(self, name: str, loader: Callable[[Any], Awaitable[list]], key: Callable[[Any], str]):
+        self.name = name
+        self._loader = loader
+        self._key = key
+        self._snapshot: CatalogSnapshot | None = None
+        self._lock = asyncio.Lock()
+        self._path = os.path.join(CATALOG_CACHE_DIR, f"{name}.gen")
+
+    def _generation(self) -> int:
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _is_fresh(self, snapshot: CatalogSnapshot | None) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.generation == self._generation()
+            and time.monotonic() - snapshot.loaded_at < CATALOG_CACHE_TTL
+        )
+
+    async def get(self, db) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        async with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            # La generación se lee antes de consultar: si alguien invalida mientras
+            # cargamos, la próxima lectura verá una generación nueva y recargará.
+            generation = self._generation()
+            rows = await self._loader(db)
+            digest = hashlib.sha1()
+            for row in rows:
+                digest.update(f"{self._key(row)}|{row.updatedAt.isoformat()}\n".encode())
+            self._snapshot = CatalogSnapshot(
+                rows=rows,
+                by_id={self._key(row): row for row in rows},
+                etag=f'W/"{self.name}-{digest.hexdigest()[:16]}"',
+                generation=generation,
+                loaded_at=time.monotonic(),
+            )
+            return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+        os.makedirs(CATALOG_CACHE_DIR, exist_ok=True)
+        now = time.time_ns()
+        with open(self._path, "a"):
+            pass
+        os.utime(self._path, ns=(now, now))
+
+
+class TTLCache:
+    """LRU acotado con expiración por entrada y contadores de aciertos/fallos."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True si el cliente ya tiene esta versión (cabecera If-None-Match)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+productos_cache = CatalogCache(
+    "productos",
+    loader=lambda db: db.producto.find_many(order={"idProducto": "asc"}),
+    key=lambda producto: producto.idProducto,
+)
+
+asesores_cache = CatalogCache(
+    "asesores",
+    loader=lambda db: db.asesor.find_many(order={"idAsesor": "asc"}),
+    key=lambda asesor: asesor.idAsesor,
+)
+
+
+async def _from_catalog(cache: CatalogCache, db, ids: set, fetch) -> dict:
+    if not ids:
+        return {}
+    by_id = (await cache.get(db)).by_id
+    found = {i: by_id[i] for i in ids if i in by_id}
+    missing = ids - found.keys()
+    if missing:
+        # Filas que el caché aún no ve (cargadas fuera de la API)
+        for row in await fetch(list(missing)):
+            found[cache._key(row)] = row
+    return found
+
+
+async def _clientes(db, ids: set) -> dict:
+    if not ids:
+        return {}
+    return {c.idCliente: c for c in await db.cliente.find_many(where={"idCliente": {"in": list(ids)}})}
+
+
+async def load_related(db, asesores=(), clientes=(), productos=()) -> dict:
+    """Asesores, clientes y productos por id para el formato normalizado (?formato=normalizado).
+
+    Asesores y productos salen del catálogo en memoria; clientes, de una sola consulta.
+    """
+    found_asesores, found_clientes, found_productos = await asyncio.gather(
+        _from_catalog(asesores_cache, db, set(asesores), lambda ids: db.asesor.find_many(where={"idAsesor": {"in": ids}})),
+        _clientes(db, set(clientes)),
+        _from_catalog(productos_cache, db, set(productos), lambda ids: db.producto.find_many(where={"idProducto": {"in": ids}})),
+    )
+    return {"asesores": found_asesores, "clientes": found_clientes, "productos": found_productos}
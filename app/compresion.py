@@ -0,0 +1,189 @@
+"""Compresión negociada de respuestas (gzip, y brotli/zstd si están instalados).
+
+Middleware ASGI puro: comprime respuestas completas a partir de COMPRESION_MINIMO bytes
+y las respuestas en streaming bloque a bloque (con flush, para que el cliente reciba
+cada lote apenas sale). Respeta las respuestas que ya traen Content-Encoding (p. ej.
+/pedidos/export?gzip=true) y las rutas marcadas con @sin_compresion.
+"""
+import os
+import zlib
+from typing import Callable, Optional
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # opcional
+    zstandard = None
+
+COMPRESION_MINIMO = int(os.getenv("COMPRESION_MINIMO", "1024"))
+COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BR = int(os.getenv("COMPRESION_NIVEL_BR", "4"))
+COMPRESION_NIVEL_ZSTD = int(os.getenv("COMPRESION_NIVEL_ZSTD", "3"))
+
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+
+
+def sin_compresion(endpoint: Callable) -> Callable:
+    """Marca un endpoint para que el middleware nunca comprima su respuesta."""
+    endpoint._sin_compresion = True
+    return endpoint
+
+
+class _Gzip:
+    def __init__(self, nivel: int):
+        self._c = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def vaciar(self) -> bytes:
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self) -> bytes:
+        return self._c.flush()
+
+
+class _Brotli:
+    def __init__(self, nivel: int):
+        self._c = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def vaciar(self) -> bytes:
+        return self._c.flush()
+
+    def terminar(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, nivel: int):
+        self._c = zstandard.ZstdCompressor(level=nivel).compressobj()
+
+    def comprimir(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def vaciar(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def terminar(self) -> bytes:
+        return self._c.flush()
+
+
+def codificaciones_disponibles() -> dict:
+    """Codificación -> fábrica de compresores, en orden de preferencia del servidor."""
+    disponibles = {}
+    if brotli is not None:
+        disponibles["br"] = lambda nivel=COMPRESION_NIVEL_BR: _Brotli(nivel)
+    if zstandard is not None:
+        disponibles["zstd"] = lambda nivel=COMPRESION_NIVEL_ZSTD: _Zstd(nivel)
+    disponibles["gzip"] = lambda nivel=COMPRESION_NIVEL_GZIP: _Gzip(nivel)
+    return disponibles
+
+
+def negociar(accept_encoding: str, disponibles) -> Optional[str]:
+    """Elige la codificación según Accept-Encoding (con q-values); None si no hay ninguna aceptable."""
+    pesos = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, params = parte.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            pesos[nombre.strip().lower()] = q
+    comodin = pesos.get("*", 0.0)
+    candidatas = [(pesos.get(c, comodin), -i, c) for i, c in enumerate(disponibles)]
+    q, _, elegida = max(candidatas, default=(0.0, 0, None))
+    return elegida if q > 0 else None
+
+
+class CompresionMiddleware:
+    def __init__(self, app, minimo: int = COMPRESION_MINIMO):
+        self.app = app
+        self.minimo = minimo
+        self.disponibles = codificaciones_disponibles()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cabeceras = dict(scope["headers"])
+        codificacion = negociar(cabeceras.get(b"accept-encoding", b"").decode("latin-1"), self.disponibles)
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor = None
+        omitir = False
+
+        async def enviar(message):
+            nonlocal inicio, compresor, omitir
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer bloque del cuerpo: ahí se decide si comprimir
+                inicio = message
+                return
+            if message["type"] != "http.response.body" or (inicio is None and compresor is None):
+                await send(message)
+                return
+
+            cuerpo = message.get("body", b"")
+            mas = message.get("more_body", False)
+            if inicio is not None:
+                mensaje_inicio, inicio = inicio, None
+                omitir = not self._comprimible(scope, mensaje_inicio, cuerpo, mas)
+                if not omitir:
+                    compresor = self.disponibles[codificacion]()
+                    mensaje_inicio = self._cabeceras_comprimidas(mensaje_inicio, codificacion)
+                    if not mas:
+                        comprimido = compresor.comprimir(cuerpo) + compresor.terminar()
+                        mensaje_inicio["headers"].append((b"content-length", str(len(comprimido)).encode()))
+                        await send(mensaje_inicio)
+                        await send({"type": "http.response.body", "body": comprimido})
+                        return
+                await send(mensaje_inicio)
+
+            if omitir:
+                await send(message)
+                return
+            # Streaming: cada bloque sale comprimido y vaciado, sin esperar al siguiente
+            salida = compresor.comprimir(cuerpo) + (compresor.vaciar() if mas else compresor.terminar())
+            await send({"type": "http.response.body", "body": salida, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
+
+    def _comprimible(self, scope, inicio, cuerpo: bytes, mas: bool) -> bool:
+        if getattr(scope.get("endpoint"), "_sin_compresion", False):
+            return False
+        if inicio["status"] < 200 or inicio["status"] in (204, 304):
+            return False
+        headers = {k.lower(): v for k, v in inicio["headers"]}
+        if b"content-encoding" in headers:
+            return False
+        tipo = headers.get(b"content-type", b"").decode("latin-1")
+        if not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return False
+        # En streaming no se conoce el tamaño total: se comprime siempre
+        return mas or len(cuerpo) >= self.minimo
+
+    @staticmethod
+    def _cabeceras_comprimidas(inicio, codificacion: str) -> dict:
+        headers = [(k, v) for k, v in inicio["headers"] if k.lower() != b"content-length"]
+        vary = [v for k, v in headers if k.lower() == b"vary"]
+        headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+        vary_valor = b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"
+        headers += [(b"content-encoding", codificacion.encode()), (b"vary", vary_valor)]
+        # El ETag del contenido sin comprimir pasa a ser débil: los bytes ya no son los mismos
+        headers = [
+            (k, b"W/" + v if k.lower() == b"etag" and not v.startswith(b"W/") else v) for k, v in headers
+        ]
+        return {**inicio, "headers": headers}
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from dotenv import load_dotenv
+from prisma import Prisma
+
+from app.eventos import central
+from app.metricas import CONEXION, instalar_hook_prisma, muestrear_pool
+from app.trazas import instalar_trazas
+
+load_dotenv()
+
+# Configuración del pool de conexiones (por worker de gunicorn)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))          # segundos esperando una conexión libre
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))    # segundos para conectar con el motor
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "30"))      # segundos por consulta al motor
+DB_DRAIN_TIMEOUT = float(os.getenv("DB_DRAIN_TIMEOUT", "20"))      # segundos esperando peticiones en curso al apagar
+
+
+def build_database_url(url: str) -> str:
+    """Agrega los parámetros del pool a DATABASE_URL sin pisar los que ya vengan en la URL."""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query))
+    params.setdefault("connection_limit", str(DB_POOL_SIZE))
+    params.setdefault("pool_timeout", str(DB_POOL_TIMEOUT))
+    params.setdefault("connect_timeout", str(DB_CONNECT_TIMEOUT))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+# Mide cada consulta (métricas por petición); se instala antes de crear el cliente
+instalar_hook_prisma()
+
+# Cliente único por proceso: se conecta en el arranque y se comparte entre peticiones
+db = Prisma(
+    datasource={"url": build_database_url(os.environ["DATABASE_URL"])},
+    connect_timeout=timedelta(seconds=DB_CONNECT_TIMEOUT),
+    http={"timeout": httpx.Timeout(DB_QUERY_TIMEOUT)},
+)
+instalar_trazas(db)
+
+_in_flight = 0
+_drained = asyncio.Event()
+_drained.set()
+
+
+async def connect_db():
+    if not db.is_connected():
+        inicio = time.perf_counter()
+        await db.connect()
+        CONEXION.set(time.perf_counter() - inicio)
+
+
+async def disconnect_db():
+    # Esperamos a que terminen las peticiones que todavía usan el cliente
+    try:
+        await asyncio.wait_for(_drained.wait(), timeout=DB_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+    if db.is_connected():
+        await db.disconnect()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await connect_db()
+    muestreo = asyncio.create_task(muestrear_pool(db))
+    try:
+        yield
+    finally:
+        muestreo.cancel()
+        # Los flujos de eventos no terminan solos: se cierran antes de esperar el drenaje
+        await central.cerrar()
+        await disconnect_db()
+
+
+# Dependencia compartida por todos los routers
+async def get_prisma_client():
+    global _in_flight
+    _in_flight += 1
+    _drained.clear()
+    try:
+        yield db
+    finally:
+        _in_flight -= 1
+        if _in_flight == 0:
+            _drained.set()
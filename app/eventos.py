@@ -0,0 +1,319 @@
+"""Eventos de pedidos para el canal en vivo (WebSocket y SSE, ver app/routes/eventos.py).
+
+Las rutas de escritura de pedidos.py y detalle_pedidos.py llaman a publicar(), que inserta
+una fila por pedido en EventoPedido (dentro de la misma transacción cuando la hay, como
+última sentencia) y avisa con NOTIFY. Cada worker de gunicorn tiene una sola Central que,
+mientras haya suscriptores, lee las filas nuevas con una consulta por ciclo sin importar
+cuántos clientes estén conectados y las reparte en memoria según sus filtros. Así todos
+los workers ven los eventos de todos, y un cliente que reconecta con el último id
+recibido recupera lo que se perdió desde la tabla.
+
+Los ids los asigna una secuencia antes del commit, así que pueden hacerse visibles
+desordenados: si falta un id intermedio, la Central espera hasta EVENTOS_HUECO_SEGUNDOS
+a que aparezca antes de saltarlo (una transacción revertida deja el hueco para siempre).
+Esto mantiene el orden por id que usa la reanudación.
+
+Una conexión LISTEN (asyncpg; Prisma no puede escuchar) despierta a la Central apenas
+otro worker publica. Si no se puede abrir, se consulta cada EVENTOS_POLL_SEGUNDOS.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import orjson
+from prisma import Prisma
+
+try:
+    import asyncpg
+except ImportError:  # sin asyncpg los eventos se leen por sondeo
+    asyncpg = None
+
+log = logging.getLogger(__name__)
+
+EVENTOS_POLL_SEGUNDOS = float(os.getenv("EVENTOS_POLL_SEGUNDOS", "1"))
+EVENTOS_HUECO_SEGUNDOS = float(os.getenv("EVENTOS_HUECO_SEGUNDOS", "2"))
+EVENTOS_RETENCION_HORAS = int(os.getenv("EVENTOS_RETENCION_HORAS", "24"))
+# Más eventos pendientes que esto al reanudar: se pide al cliente que recargue todo
+EVENTOS_REPETIR_MAX = int(os.getenv("EVENTOS_REPETIR_MAX", "1000"))
+EVENTOS_COLA_MAX = int(os.getenv("EVENTOS_COLA_MAX", "1000"))
+EVENTOS_MAX_SUSCRIPTORES = int(os.getenv("EVENTOS_MAX_SUSCRIPTORES", "500"))
+EVENTOS_LOTE = 500
+EVENTOS_PURGA_SEGUNDOS = 600
+CANAL = "eventos_pedido"
+
+CREADO = "pedido.creado"
+ACTUALIZADO = "pedido.actualizado"
+STATUS = "pedido.status"
+ELIMINADO = "pedido.eliminado"
+REINICIO = "reinicio"
+
+_INSERTAR = f'''
+WITH nuevos AS (
+    INSERT INTO "EventoPedido" ("tipo", "idPedido", "idAsesor", "idEmpresa", "Status", "createdBy", "createdAt")
+    SELECT $1, e."idPedido", e."idAsesor", e."idEmpresa", e."Status", $2, now() AT TIME ZONE 'UTC'
+    FROM json_to_recordset($3::json) AS e("idPedido" text, "idAsesor" text, "idEmpresa" int, "Status" text)
+    RETURNING id
+)
+SELECT count(*) AS avisos FROM (SELECT pg_notify('{CANAL}', COALESCE(max(id), 0)::text) FROM nuevos) n
+'''
+# pg_notify devuelve void, que query_raw no sabe deserializar: se cuenta en lugar de devolverlo
+
+_COLUMNAS = '"id", "tipo", "idPedido", "idAsesor", "idEmpresa", "Status", "createdBy", "createdAt"'
+
+
+class Evento(NamedTuple):
+    id: int
+    tipo: str
+    idAsesor: Optional[str]
+    idEmpresa: Optional[int]
+    datos: str  # JSON ya serializado: se arma una vez y se envía a todos los suscriptores
+
+
+def _evento(fila: dict) -> Evento:
+    fila["id"] = int(fila["id"])
+    return Evento(fila["id"], fila["tipo"], fila["idAsesor"], fila["idEmpresa"], orjson.dumps(fila).decode())
+
+
+def reinicio(ultimo: int) -> Evento:
+    """Avisa al cliente que recargue la lista completa; luego sigue en vivo desde `ultimo`."""
+    return Evento(ultimo, REINICIO, None, None, orjson.dumps({"id": ultimo, "tipo": REINICIO}).decode())
+
+
+# --- PUBLICACIÓN ---
+async def publicar(db: Prisma, tipo: str, pedidos, usuario: str) -> None:
+    """Registra un evento `tipo` por cada pedido.
+
+    Con una transacción, llamarla como última sentencia: el evento se confirma (y el NOTIFY
+    sale) junto con el cambio, y el id queda reservado el menor tiempo posible. Si falla,
+    el error sube: la transacción ya quedó abortada y el cambio no se guarda. Sin
+    transacción, llamarla después de la escritura; si falla solo se registra en el log.
+    """
+    filas = [
+        {"idPedido": p.idPedido, "idAsesor": p.idAsesor, "idEmpresa": p.idEmpresa, "Status": p.Status}
+        for p in pedidos
+    ]
+    if not filas:
+        return
+    try:
+        await db.query_raw(_INSERTAR, tipo, usuario, orjson.dumps(filas).decode())
+    except Exception:
+        if db.is_transaction():
+            raise
+        log.exception("No se pudo publicar %s de %d pedidos", tipo, len(filas))
+        return
+    central.despertar()
+
+
+# --- SUSCRIPCIONES ---
+class Suscripcion:
+    def __init__(self, idAsesor: Optional[str] = None, idEmpresa: Optional[int] = None):
+        self.idAsesor = idAsesor
+        self.idEmpresa = idEmpresa
+        self.cola: asyncio.Queue[Optional[Evento]] = asyncio.Queue(maxsize=EVENTOS_COLA_MAX)
+
+    def acepta(self, evento: Evento) -> bool:
+        return (self.idAsesor is None or evento.idAsesor == self.idAsesor) and (
+            self.idEmpresa is None or evento.idEmpresa == self.idEmpresa
+        )
+
+    def entregar(self, evento: Evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se corta y, al reconectar con su último id, se pone al día desde la tabla
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)
+
+
+class Central:
+    def __init__(self):
+        self._suscripciones: set[Suscripcion] = set()
+        self._tarea: Optional[asyncio.Task] = None
+        self._despertar = asyncio.Event()
+        self._listo = asyncio.Event()
+        self._oyente = None
+        self.ultimo = 0            # último id repartido (marca de agua)
+        self._hueco: Optional[tuple[int, float]] = None
+        self._ultima_purga = 0.0
+
+    @property
+    def suscriptores(self) -> int:
+        return len(self._suscripciones)
+
+    def despertar(self):
+        self._despertar.set()
+
+    async def suscribir(self, db: Prisma, suscripcion: Suscripcion) -> int:
+        """Registra la suscripción y devuelve la marca de agua: los eventos posteriores llegan a su cola."""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._correr(db))
+        if not self._suscripciones:
+            # Primera suscripción tras estar inactiva: la tarea retoma desde el último id actual
+            self._listo.clear()
+        self._suscripciones.add(suscripcion)
+        self.despertar()
+        await self._listo.wait()
+        return self.ultimo
+
+    def desuscribir(self, suscripcion: Suscripcion):
+        self._suscripciones.discard(suscripcion)
+
+    async def cerrar(self):
+        """Al apagar el worker: termina todos los flujos, detiene la tarea y cierra el LISTEN.
+
+        Los clientes reconectan (a otro worker) con su último id y no pierden eventos.
+        """
+        for s in self._suscripciones:
+            s.entregar(None)
+        self._listo.set()  # quien estaba en suscribir() no queda esperando
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._tarea = None
+        await self._dejar_de_escuchar()
+
+    async def _correr(self, db: Prisma):
+        try:
+            while True:
+                if not self._suscripciones:
+                    # Sin clientes no se consulta la base; se espera al próximo suscribir()
+                    await self._dejar_de_escuchar()
+                    self._despertar.clear()
+                    if not self._suscripciones:
+                        await self._despertar.wait()
+                    continue
+                if not self._listo.is_set():
+                    fila = await db.query_raw('SELECT COALESCE(max(id), 0) AS id FROM "EventoPedido"')
+                    self.ultimo = int(fila[0]["id"])
+                    self._hueco = None
+                    await self._escuchar()
+                    self._listo.set()
+
+                completo = await self._leer(db)
+                await self._purgar(db)
+                if completo:
+                    continue  # quedan filas: se sigue leyendo sin esperar
+                self._despertar.clear()
+                espera = EVENTOS_HUECO_SEGUNDOS / 4 if self._hueco else EVENTOS_POLL_SEGUNDOS * (5 if self._oyente else 1)
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), timeout=espera)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Falló la lectura de eventos; se cierran las suscripciones para que reconecten")
+            for s in self._suscripciones:
+                s.entregar(None)
+            self._listo.set()
+            await self._dejar_de_escuchar()
+
+    async def _leer(self, db: Prisma) -> bool:
+        filas = await db.query_raw(
+            f'SELECT {_COLUMNAS} FROM "EventoPedido" WHERE id > $1 ORDER BY id LIMIT {EVENTOS_LOTE}', self.ultimo
+        )
+        esperado = self.ultimo + 1
+        for fila in filas:
+            id_evento = int(fila["id"])
+            if id_evento != esperado:
+                # Falta un id: otra transacción lo tomó y todavía no confirmó (o se revirtió)
+                if self._hueco is None or self._hueco[0] != esperado:
+                    self._hueco = (esperado, time.monotonic())
+                if time.monotonic() - self._hueco[1] < EVENTOS_HUECO_SEGUNDOS:
+                    return False
+            self._hueco = None
+            evento = _evento(fila)
+            for s in self._suscripciones:
+                if s.acepta(evento):
+                    s.entregar(evento)
+            self.ultimo = id_evento
+            esperado = id_evento + 1
+        return len(filas) == EVENTOS_LOTE
+
+    async def _purgar(self, db: Prisma):
+        if time.monotonic() - self._ultima_purga < EVENTOS_PURGA_SEGUNDOS:
+            return
+        self._ultima_purga = time.monotonic()
+        await db.execute_raw(
+            'DELETE FROM "EventoPedido" WHERE "createdAt" < now() AT TIME ZONE \'UTC\' - make_interval(hours => $1)',
+            EVENTOS_RETENCION_HORAS,
+        )
+
+    async def _escuchar(self):
+        if asyncpg is None or self._oyente is not None:
+            return
+        try:
+            # asyncpg no entiende los parámetros propios de Prisma (schema, connection_limit...)
+            url = urlunsplit(urlsplit(os.environ["DATABASE_URL"])._replace(query=""))
+            self._oyente = await asyncpg.connect(url)
+            await self._oyente.add_listener(CANAL, lambda *_: self.despertar())
+        except Exception:
+            log.warning("No se pudo abrir LISTEN %s; los eventos se leen por sondeo", CANAL, exc_info=True)
+            self._oyente = None
+
+    async def _dejar_de_escuchar(self):
+        if self._oyente is not None:
+            oyente, self._oyente = self._oyente, None
+            try:
+                await oyente.close()
+            except Exception:
+                pass
+
+
+central = Central()
+
+
+async def flujo(db: Prisma, suscripcion: Suscripcion, desde: Optional[int], latido: float):
+    """Eventos para un cliente: primero los posteriores a `desde` (reanudación) y luego en vivo.
+
+    Produce None cada `latido` segundos sin eventos (para mantener viva la conexión) y
+    termina si el cliente quedó atrás (cola desbordada) o la Central falló.
+    """
+    marca = await central.suscribir(db, suscripcion)
+    try:
+        ultimo = marca if desde is None else desde
+        if desde is not None and desde < marca:
+            where = ['id > $1', 'id <= $2']
+            params: list = [desde, marca]
+            if suscripcion.idAsesor is not None:
+                params.append(suscripcion.idAsesor)
+                where.append(f'"idAsesor" = ${len(params)}')
+            if suscripcion.idEmpresa is not None:
+                params.append(suscripcion.idEmpresa)
+                where.append(f'"idEmpresa" = ${len(params)}')
+            filas, minimo = await asyncio.gather(
+                db.query_raw(
+                    f'SELECT {_COLUMNAS} FROM "EventoPedido" WHERE {" AND ".join(where)} '
+                    f'ORDER BY id LIMIT {EVENTOS_REPETIR_MAX + 1}', *params
+                ),
+                db.query_raw('SELECT min(id) AS id FROM "EventoPedido"'),
+            )
+            purgados = minimo[0]["id"] is None or int(minimo[0]["id"]) > desde + 1
+            if len(filas) > EVENTOS_REPETIR_MAX or purgados:
+                # Demasiado atrás (o ya purgado): más barato recargar la lista que repetir
+                yield reinicio(marca)
+            else:
+                for fila in filas:
+                    yield _evento(fila)
+            ultimo = marca
+
+        while True:
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if evento is None:
+                return
+            if evento.id > ultimo:
+                ultimo = evento.id
+                yield evento
+    finally:
+        central.desuscribir(suscripcion)
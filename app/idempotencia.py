@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from prisma import Prisma
+from prisma.errors import UniqueViolationError
+
+from app.serializacion import adaptador
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Cuánto se guarda la respuesta para repetirla ante reintentos
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# Una clave "en curso" sin latido (lockedAt sin renovar) hace más de esto se considera
+# abandonada (worker caído) y se retoma; mientras la petición corre, lockedAt se renueva
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_HEARTBEAT_SECONDS = IDEMPOTENCY_LOCK_SECONDS / 4
+# Cuánto espera un reintento concurrente a que termine la primera petición antes de responder 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_PURGE_SECONDS = 600
+IDEMPOTENCY_MAX_LENGTH = 255
+
+_ultima_purga = 0.0
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def huella(ruta: str, cuerpo: str) -> str:
+    return hashlib.sha256(f"{ruta}\n{cuerpo}".encode()).hexdigest()
+
+
+def _repetir(registro) -> Response:
+    return Response(
+        content=registro.respuesta.encode(),
+        status_code=registro.status,
+        media_type=registro.mediaType,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _purgar(db: Prisma):
+    # Limpieza perezosa de claves vencidas, como mucho una vez cada IDEMPOTENCY_PURGE_SECONDS por worker
+    global _ultima_purga
+    if time.monotonic() - _ultima_purga < IDEMPOTENCY_PURGE_SECONDS:
+        return
+    _ultima_purga = time.monotonic()
+    await db.claveidempotencia.delete_many(where={"expiresAt": {"lt": _ahora()}})
+
+
+async def _reservar(db: Prisma, usuario: str, clave: str, ruta: str, firma: str):
+    """Toma el candado de la clave. Devuelve None si esta petición debe ejecutarse,
+    o el registro guardado si hay que repetir su respuesta."""
+    limite = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        ahora = _ahora()
+        try:
+            await db.claveidempotencia.create(data={
+                "username": usuario,
+                "clave": clave,
+                "ruta": ruta,
+                "huella": firma,
+                "lockedAt": ahora,
+                "expiresAt": ahora + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            })
+            return None
+        except UniqueViolationError:
+            pass
+
+        registro = await db.claveidempotencia.find_unique(where={"username_clave": {"username": usuario, "clave": clave}})
+        if registro is None:
+            continue  # se purgó entre el create y la lectura
+        if registro.expiresAt < ahora:
+            await db.claveidempotencia.delete_many(
+                where={"username": usuario, "clave": clave, "expiresAt": {"lt": ahora}}
+            )
+            continue
+        if registro.huella != firma:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=f"{IDEMPOTENCY_HEADER} ya usada con otra petición"
+            )
+        if registro.status is not None:
+            return registro
+
+        # La primera petición sigue en curso: si quedó abandonada la retomamos, si no esperamos
+        retomada = await db.claveidempotencia.update_many(
+            where={
+                "username": usuario,
+                "clave": clave,
+                "status": None,
+                "lockedAt": {"lt": ahora - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)},
+            },
+            data={"lockedAt": ahora},
+        )
+        if retomada:
+            return None
+        if time.monotonic() >= limite:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Una petición con la misma Idempotency-Key está en curso",
+                headers={"Retry-After": "2"},
+            )
+        await asyncio.sleep(0.1)
+
+
+async def _latir(db: Prisma, usuario: str, clave: str):
+    # Una petición lenta pero viva no debe parecer abandonada: si no, un reintento la ejecutaría otra vez
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_HEARTBEAT_SECONDS)
+        try:
+            await db.claveidempotencia.update_many(
+                where={"username": usuario, "clave": clave, "status": None},
+                data={"lockedAt": _ahora()},
+            )
+        except Exception:
+            log.warning("No se pudo renovar la Idempotency-Key %s de %s", clave, usuario, exc_info=True)
+
+
+async def idempotente(
+    db: Prisma,
+    clave: Optional[str],
+    usuario: str,
+    ruta: str,
+    cuerpo: str,
+    ejecutar: Callable[[], Awaitable[Any]],
+    modelo: Any,
+    status_code: int = status.HTTP_200_OK,
+):
+    """Ejecuta `ejecutar` una sola vez por (usuario, Idempotency-Key).
+
+    Sin clave se comporta igual que llamar al endpoint directamente. Con clave, la
+    respuesta (éxito o error 4xx) se guarda tal cual y los reintentos la reciben byte
+    a byte sin volver a ejecutar la transacción. Los errores 5xx liberan la clave para
+    que el cliente pueda reintentar.
+    """
+    if not clave:
+        return await ejecutar()
+    if len(clave) > IDEMPOTENCY_MAX_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{IDEMPOTENCY_HEADER} demasiado larga")
+
+    await _purgar(db)
+    firma = huella(ruta, cuerpo)
+    guardado = await _reservar(db, usuario, clave, ruta, firma)
+    if guardado is not None:
+        return _repetir(guardado)
+
+    latido = asyncio.create_task(_latir(db, usuario, clave))
+    try:
+        resultado = await ejecutar()
+        serializador = adaptador(modelo)
+        respuesta = Response(
+            content=serializador.dump_json(serializador.validate_python(resultado, from_attributes=True)),
+            status_code=status_code,
+            media_type="application/json",
+        )
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await db.claveidempotencia.delete_many(where={"username": usuario, "clave": clave})
+            raise
+        respuesta = JSONResponse(
+            content=jsonable_encoder({"detail": e.detail}), status_code=e.status_code, headers=e.headers
+        )
+    except BaseException:
+        await db.claveidempotencia.delete_many(where={"username": usuario, "clave": clave})
+        raise
+    finally:
+        latido.cancel()
+
+    await db.claveidempotencia.update(
+        where={"username_clave": {"username": usuario, "clave": clave}},
+        data={"status": respuesta.status_code, "respuesta": respuesta.body.decode(), "mediaType": "application/json"},
+    )
+    return respuesta
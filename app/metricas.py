@@ -0,0 +1,163 @@
+"""Métricas Prometheus: latencia por ruta, consultas y tiempo de base por petición, pool.
+
+Con varios workers de gunicorn cada proceso escribe sus valores en PROMETHEUS_MULTIPROC_DIR
+(lo prepara gunicorn.conf.py) y GET /metrics los suma al responder, sin importar qué
+worker atienda el scrape. Sin esa variable (uvicorn en desarrollo) se usa el registro
+normal del proceso.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from prisma import Prisma
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+log = logging.getLogger(__name__)
+
+MULTIPROCESO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+# Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Cada cuántos segundos cada worker copia las métricas del pool del motor de Prisma
+METRICS_POOL_INTERVAL = float(os.getenv("METRICS_POOL_INTERVAL", "15"))
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+PETICIONES = Counter("http_requests_total", "Peticiones HTTP atendidas", ["method", "route", "status"])
+LATENCIA = Histogram("http_request_duration_seconds", "Duración de la petición", ["method", "route"], buckets=BUCKETS_LATENCIA)
+EN_CURSO = Gauge("http_requests_in_progress", "Peticiones en curso", ["method"], multiprocess_mode="livesum")
+CONSULTAS_POR_PETICION = Histogram(
+    "db_queries_per_request", "Consultas Prisma por petición", ["route"], buckets=BUCKETS_CONSULTAS
+)
+TIEMPO_DB_POR_PETICION = Histogram(
+    "db_time_per_request_seconds", "Tiempo total en Prisma por petición", ["route"], buckets=BUCKETS_LATENCIA
+)
+CONSULTAS = Histogram("db_query_duration_seconds", "Duración de cada consulta Prisma", ["method"], buckets=BUCKETS_LATENCIA)
+CONEXION = Gauge("db_connect_seconds", "Tiempo que tardó db.connect() al arrancar el worker", multiprocess_mode="max")
+POOL = Gauge("db_engine_metric", "Métricas del pool del motor de Prisma (gauges y contadores)", ["metric"], multiprocess_mode="livesum")
+
+SIN_RUTA = "sin_ruta"
+
+# Consultas y segundos en Prisma de la petición en curso; las tareas hijas (gather) comparten la lista
+_consumo_db: ContextVar[Optional[list]] = ContextVar("consumo_db", default=None)
+
+# Funciones (cliente, method, arguments, model, duracion) llamadas tras cada consulta (ver app/trazas.py)
+_observadores: list[Callable] = []
+
+
+def agregar_observador(observador: Callable):
+    if observador not in _observadores:
+        _observadores.append(observador)
+
+
+# --- HOOK DE PRISMA ---
+def instalar_hook_prisma():
+    """Envuelve Prisma._execute (por donde pasan todas las consultas, también las raw y las
+    de transacciones) para medir cada consulta. Idempotente."""
+    original = Prisma._execute
+    if getattr(original, "_medido", False):
+        return
+
+    async def _execute(self, *, method, arguments, model=None, root_selection=None):
+        inicio = time.perf_counter()
+        try:
+            return await original(self, method=method, arguments=arguments, model=model, root_selection=root_selection)
+        finally:
+            duracion = time.perf_counter() - inicio
+            CONSULTAS.labels(method).observe(duracion)
+            consumo = _consumo_db.get()
+            if consumo is not None:
+                consumo[0] += 1
+                consumo[1] += duracion
+            for observador in _observadores:
+                observador(self, method, arguments, model, duracion)
+
+    _execute._medido = True
+    Prisma._execute = _execute
+
+
+def consumo_db() -> tuple[int, float]:
+    """(consultas, segundos) acumulados por la petición actual."""
+    consumo = _consumo_db.get()
+    return (consumo[0], consumo[1]) if consumo else (0, 0.0)
+
+
+# --- MIDDLEWARE ---
+class MetricasMiddleware:
+    def __init__(self, app, excluir: tuple = ("/metrics",)):
+        self.app = app
+        self.excluir = excluir
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluir:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        codigo = 500
+        consumo = [0, 0.0]
+        token = _consumo_db.set(consumo)
+
+        async def enviar(message):
+            nonlocal codigo
+            if message["type"] == "http.response.start":
+                codigo = message["status"]
+            await send(message)
+
+        EN_CURSO.labels(metodo).inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            EN_CURSO.labels(metodo).dec()
+            _consumo_db.reset(token)
+            # La plantilla de la ruta (/pedidos/{pedido_id}), no la URL: cardinalidad acotada
+            ruta = getattr(scope.get("route"), "path", SIN_RUTA)
+            PETICIONES.labels(metodo, ruta, str(codigo)).inc()
+            LATENCIA.labels(metodo, ruta).observe(duracion)
+            CONSULTAS_POR_PETICION.labels(ruta).observe(consumo[0])
+            TIEMPO_DB_POR_PETICION.labels(ruta).observe(consumo[1])
+
+
+# --- POOL DEL MOTOR ---
+async def muestrear_pool(db: Prisma):
+    """Copia periódicamente las métricas del motor de Prisma (conexiones abiertas/ocupadas/
+    libres, consultas esperando conexión) a gauges sumables entre workers.
+
+    Requiere previewFeatures = ["metrics"] en schema.prisma; si el motor no las expone se
+    registra una vez y el muestreo termina.
+    """
+    while True:
+        try:
+            metricas = await db.get_metrics()
+        except Exception:
+            log.warning("El motor de Prisma no expone métricas; se omite el muestreo del pool", exc_info=True)
+            return
+        for m in (*metricas.counters, *metricas.gauges):
+            POOL.labels(m.key).set(m.value)
+        for h in metricas.histograms:
+            POOL.labels(f"{h.key}_sum").set(h.value.sum)
+            POOL.labels(f"{h.key}_count").set(h.value.count)
+        await asyncio.sleep(METRICS_POOL_INTERVAL)
+
+
+# --- ENDPOINT ---
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No autorizado")
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        datos = generate_latest(registro)
+    else:
+        datos = generate_latest()
+    return Response(content=datos, media_type=CONTENT_TYPE_LATEST)
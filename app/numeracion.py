@@ -0,0 +1,30 @@
+import os
+
+from prisma import Prisma
+
+# Tamaño máximo de bloque que un dispositivo puede reservar de una vez
+NUMERACION_MAX_BLOQUE = int(os.getenv("NUMERACION_MAX_BLOQUE", "1000"))
+
+# Un UPDATE ... RETURNING por serie: incrementa y devuelve en una sola sentencia, así que
+# dos peticiones concurrentes nunca reciben el mismo número. Empresa.idPedido/idRecibo
+# guardan el próximo número libre.
+_RESERVAR = {
+    "pedido": (
+        'UPDATE "Empresa" SET "idPedido" = "idPedido" + $1 WHERE "idEmpresa" = $2 '
+        'RETURNING "idPedido" - $1 AS desde, "idPedido" - 1 AS hasta'
+    ),
+    "recibo": (
+        'UPDATE "Empresa" SET "idRecibo" = "idRecibo" + $1 WHERE "idEmpresa" = $2 '
+        'RETURNING "idRecibo" - $1 AS desde, "idRecibo" - 1 AS hasta'
+    ),
+}
+
+SERIES = tuple(_RESERVAR)
+
+
+async def reservar_numeros(db: Prisma, id_empresa: int, serie: str, cantidad: int = 1) -> tuple[int, int] | None:
+    """Reserva `cantidad` números consecutivos de la serie; devuelve (desde, hasta) o None si no existe la empresa."""
+    fila = await db.query_first(_RESERVAR[serie], cantidad, id_empresa)
+    if fila is None:
+        return None
+    return int(fila["desde"]), int(fila["hasta"])
@@ -0,0 +1,55 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+# Tamaño de página configurable por entorno
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Cabecera donde viaja el cursor de la siguiente página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+    raw = json.dumps({"c": created_at.isoformat(), "id": record_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["c"]), str(data["id"])
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def keyset_where(cursor: str | None, id_field: str, descending: bool = True) -> dict:
+    """Condición Prisma para continuar después del cursor ordenando por (createdAt, id_field)."""
+    if not cursor:
+        return {}
+    created_at, record_id = decode_cursor(cursor)
+    op = "lt" if descending else "gt"
+    return {
+        "OR": [
+            {"createdAt": {op: created_at}},
+            {"createdAt": created_at, id_field: {op: record_id}},
+        ]
+    }
+
+
+def keyset_order(id_field: str, descending: bool = True) -> list[dict]:
+    direction = "desc" if descending else "asc"
+    return [{"createdAt": direction}, {id_field: direction}]
+
+
+def paginate(rows: list, limit: int, id_field: str, response) -> list:
+    """Recorta la fila extra pedida (limit + 1) y publica el cursor de la siguiente página."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.createdAt, getattr(last, id_field))
+    return rows
@@ -0,0 +1,136 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from prisma import Prisma
+
+log = logging.getLogger(__name__)
+
+CARACAS = ZoneInfo("America/Caracas")
+
+# Día local (Caracas) de un pedido; Prisma guarda las fechas en UTC sin zona
+DIA_LOCAL_SQL = """date(p."fechaPedido" AT TIME ZONE 'UTC' AT TIME ZONE 'America/Caracas')"""
+
+# Una porción es (día local, idAsesor, idCliente): la unidad que se recalcula tras cada escritura
+Porcion = tuple[date, str, str]
+
+_AGREGADOS_PEDIDO = """
+    SELECT {fecha}, p."idAsesor", p."idCliente", p."Status",
+           COUNT(DISTINCT p."idPedido"), COALESCE(SUM(d."Cantidad"), 0), COALESCE(SUM(d."Total"), 0)
+    FROM {origen}
+    LEFT JOIN "DetallePedido" d ON d."idPedido" = p."idPedido"
+    GROUP BY 1, 2, 3, 4
+"""
+
+_AGREGADOS_PRODUCTO = """
+    SELECT {fecha}, p."idAsesor", p."idCliente", d."idProducto", p."Status",
+           COUNT(DISTINCT p."idPedido"), SUM(d."Cantidad"), SUM(d."Total")
+    FROM {origen}
+    JOIN "DetallePedido" d ON d."idPedido" = p."idPedido"
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+_INSERTAR_PEDIDO = (
+    'INSERT INTO "ResumenPedidoDiario" ("fecha", "idAsesor", "idCliente", "Status", "pedidos", "cantidad", "total") '
+)
+_INSERTAR_PRODUCTO = (
+    'INSERT INTO "ResumenVentaDiaria" ("fecha", "idAsesor", "idCliente", "idProducto", "Status", "pedidos", "cantidad", "total") '
+)
+_CONFLICTO_PEDIDO = (
+    ' ON CONFLICT ("fecha", "idAsesor", "idCliente", "Status") DO UPDATE SET '
+    '"pedidos" = EXCLUDED."pedidos", "cantidad" = EXCLUDED."cantidad", "total" = EXCLUDED."total"'
+)
+_CONFLICTO_PRODUCTO = (
+    ' ON CONFLICT ("fecha", "idAsesor", "idCliente", "idProducto", "Status") DO UPDATE SET '
+    '"pedidos" = EXCLUDED."pedidos", "cantidad" = EXCLUDED."cantidad", "total" = EXCLUDED."total"'
+)
+
+# Las porciones viajan como VALUES; el filtro por rango UTC de fechaPedido aprovecha los índices
+_ORIGEN_PORCIONES = (
+    'porciones s JOIN "Pedido" p ON p."idAsesor" = s."idAsesor" AND p."idCliente" = s."idCliente" '
+    'AND p."fechaPedido" >= s.desde AND p."fechaPedido" < s.hasta'
+)
+
+PORCIONES_POR_SENTENCIA = 500
+
+
+def dia_local(fecha: datetime) -> date:
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.astimezone(CARACAS).date()
+
+
+def porcion(pedido) -> Porcion:
+    return (dia_local(pedido.fechaPedido), pedido.idAsesor, pedido.idCliente)
+
+
+def _inicio_utc(dia: date) -> str:
+    return datetime.combine(dia, time(), CARACAS).astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+async def _refrescar(db: Prisma, porciones: list[Porcion]):
+    valores = ', '.join(
+        f'(${i * 5 + 1}::date, ${i * 5 + 2}, ${i * 5 + 3}, ${i * 5 + 4}::timestamp, ${i * 5 + 5}::timestamp)'
+        for i in range(len(porciones))
+    )
+    params = []
+    for dia, id_asesor, id_cliente in porciones:
+        params += [dia.isoformat(), id_asesor, id_cliente, _inicio_utc(dia), _inicio_utc(dia + timedelta(days=1))]
+    con = f'WITH porciones(fecha, "idAsesor", "idCliente", desde, hasta) AS (VALUES {valores}) '
+
+    # Dos refrescos de la misma porción se serializan; el ORDER BY toma los candados siempre
+    # en el mismo orden (la función volátil se evalúa después de ordenar) y evita interbloqueos
+    await db.execute_raw(
+        con + 'SELECT pg_advisory_xact_lock(hashtext(fecha::text || \'|\' || "idAsesor" || \'|\' || "idCliente")) '
+        'FROM porciones ORDER BY fecha, "idAsesor", "idCliente"',
+        *params
+    )
+    for tabla in ("ResumenPedidoDiario", "ResumenVentaDiaria"):
+        await db.execute_raw(
+            con + f'DELETE FROM "{tabla}" r USING porciones s '
+            'WHERE r."fecha" = s.fecha AND r."idAsesor" = s."idAsesor" AND r."idCliente" = s."idCliente"',
+            *params
+        )
+    await db.execute_raw(
+        con + _INSERTAR_PEDIDO + _AGREGADOS_PEDIDO.format(fecha="s.fecha", origen=_ORIGEN_PORCIONES) + _CONFLICTO_PEDIDO,
+        *params
+    )
+    await db.execute_raw(
+        con + _INSERTAR_PRODUCTO + _AGREGADOS_PRODUCTO.format(fecha="s.fecha", origen=_ORIGEN_PORCIONES) + _CONFLICTO_PRODUCTO,
+        *params
+    )
+
+
+async def refrescar_resumen(db: Prisma, porciones) -> None:
+    """Recalcula desde las tablas de origen las porciones tocadas por una escritura.
+
+    Se llama después de confirmar la escritura. Cada tanda de porciones se borra y se vuelve
+    a insertar en una transacción, con un candado por porción: quien lee el resumen nunca ve
+    una porción vacía a medio recalcular, y dos escrituras concurrentes no se pisan. Si falla
+    solo se registra en el log: el pedido ya quedó guardado y el resumen se corrige con
+    reconstruirResumen.py.
+    """
+    porciones = list(set(porciones))
+    try:
+        for i in range(0, len(porciones), PORCIONES_POR_SENTENCIA):
+            tanda = porciones[i:i + PORCIONES_POR_SENTENCIA]
+            if db.is_transaction():
+                await _refrescar(db, tanda)
+            else:
+                async with db.tx(timeout=timedelta(seconds=30)) as transaction:
+                    await _refrescar(transaction, tanda)
+    except Exception:
+        log.exception("No se pudo actualizar el resumen de ventas (%d porciones)", len(porciones))
+
+
+async def reconstruir_resumen(db: Prisma):
+    """Vacía y recalcula ambos resúmenes a partir de todos los pedidos."""
+    await db.execute_raw('DELETE FROM "ResumenPedidoDiario"')
+    await db.execute_raw('DELETE FROM "ResumenVentaDiaria"')
+    pedidos = await db.execute_raw(
+        _INSERTAR_PEDIDO + _AGREGADOS_PEDIDO.format(fecha=DIA_LOCAL_SQL, origen='"Pedido" p')
+    )
+    productos = await db.execute_raw(
+        _INSERTAR_PRODUCTO + _AGREGADOS_PRODUCTO.format(fecha=DIA_LOCAL_SQL, origen='"Pedido" p')
+    )
+    return pedidos, productos
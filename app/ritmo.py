@@ -0,0 +1,59 @@
+"""Cubetas de fichas (token bucket) para los límites de ritmo.
+
+Las usan el control de admisión (app/admision.py) y el login por usuario (app/routes/auth.py).
+Los límites se configuran para todo el servicio. Como cada worker de gunicorn tiene sus
+propias cubetas y las peticiones de un usuario se reparten entre ellos, a cada worker le
+toca su parte (GUNICORN_WORKERS, que exporta gunicorn.conf.py al arrancar).
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+
+# 1 con uvicorn solo (devserver); con gunicorn lo fija on_starting de gunicorn.conf.py
+WORKERS = max(1, int(os.getenv("GUNICORN_WORKERS", "1")))
+
+
+class Limite:
+    def __init__(self, rafaga: int, por_minuto: float):
+        self.rafaga = rafaga
+        self.por_segundo = por_minuto / 60
+
+
+def limite(clase: str, rafaga: int, por_minuto: int) -> Limite:
+    """Límite de la clase para este worker; RATE_LIMIT_<CLASE>="ráfaga/por_minuto" lo cambia."""
+    valor = os.getenv(f"RATE_LIMIT_{clase.upper()}")
+    if valor:
+        rafaga_env, _, por_minuto_env = valor.partition("/")
+        rafaga, por_minuto = int(rafaga_env), int(por_minuto_env or rafaga_env)
+    return Limite(max(1, math.ceil(rafaga / WORKERS)), por_minuto / WORKERS)
+
+
+def segundos_retry_after(reintentar: float) -> str:
+    return str(max(1, math.ceil(reintentar)))
+
+
+class Cubetas:
+    """Cubetas de fichas por clave, con las menos usadas descartadas al pasar de `maximo`."""
+
+    def __init__(self, maximo: int = 10_000):
+        self._cubetas: OrderedDict[tuple, list[float]] = OrderedDict()
+        self._maximo = maximo
+
+    def tomar(self, clave, limite: Limite) -> float:
+        """Toma una ficha; devuelve 0 si había, o los segundos hasta la próxima."""
+        ahora = time.monotonic()
+        cubeta = self._cubetas.get(clave)
+        if cubeta is None:
+            cubeta = [float(limite.rafaga), ahora]
+            self._cubetas[clave] = cubeta
+            if len(self._cubetas) > self._maximo:
+                self._cubetas.popitem(last=False)
+        else:
+            self._cubetas.move_to_end(clave)
+            cubeta[0] = min(limite.rafaga, cubeta[0] + (ahora - cubeta[1]) * limite.por_segundo)
+            cubeta[1] = ahora
+        if cubeta[0] >= 1:
+            cubeta[0] -= 1
+            return 0.0
+        return (1 - cubeta[0]) / limite.por_segundo
@@ -1,19 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from prisma import Prisma
 from app import schemas
+from app.cache import asesores_cache, not_modified
+from app.database import get_prisma_client
 from app.routes.auth import get_current_active_user # Import get_current_active_user
+from app.routes.sync import registrar_eliminacion
+from app.serializacion import lista_json
 
 router = APIRouter()
 
-# Dependency to get a Prisma client instance
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
-
 
 @router.post("/asesores/", response_model=schemas.Asesor, status_code=status.HTTP_201_CREATED)
 async def create_asesor(
@@ -28,6 +23,7 @@ async def create_asesor(
             "createdBy": current_user.username, # Set createdBy
             "updatedBy": current_user.username  # Set updatedBy initially
         })
+        asesores_cache.invalidate()
         return created_asesor
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -35,11 +31,16 @@ async def create_asesor(
 
 @router.get("/asesores/", response_model=list[schemas.Asesor])
 async def read_asesores(
+    request: Request,
+    response: Response,
     db: Prisma = Depends(get_prisma_client),
     current_user: schemas.User = Depends(get_current_active_user) # Add dependency
 ):
-    asesores = await db.asesor.find_many()
-    return asesores
+    catalogo = await asesores_cache.get(db)
+    if not_modified(request, catalogo.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": catalogo.etag})
+    response.headers["ETag"] = catalogo.etag
+    return lista_json(schemas.Asesor, catalogo.rows, response)
 
 
 @router.get("/asesores/{asesor_id}", response_model=schemas.Asesor)
@@ -48,7 +49,10 @@ async def read_asesor(
     db: Prisma = Depends(get_prisma_client),
     current_user: schemas.User = Depends(get_current_active_user) # Add dependency
 ):
-    asesor = await db.asesor.find_unique(where={'idAsesor': asesor_id})
+    asesor = (await asesores_cache.get(db)).by_id.get(asesor_id)
+    if asesor is None:
+        # Puede ser un asesor cargado fuera de la API que el caché aún no ve
+        asesor = await db.asesor.find_unique(where={'idAsesor': asesor_id})
     if asesor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asesor not found")
     return asesor
@@ -69,6 +73,7 @@ async def update_asesor(
                 "updatedBy": current_user.username # Set updatedBy
             }
         )
+        asesores_cache.invalidate()
         return updated_asesor
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asesor not found or error during update")
@@ -81,7 +86,11 @@ async def delete_asesor(
     current_user: schemas.User = Depends(get_current_active_user) # Add dependency
 ):
     try:
-        await db.asesor.delete(where={'idAsesor': asesor_id})
+        # El borrado deja una marca para que /sync se lo informe a los dispositivos
+        async with db.tx() as transaction:
+            await transaction.asesor.delete(where={'idAsesor': asesor_id})
+            await registrar_eliminacion(transaction, "asesores", asesor_id, current_user.username)
+        asesores_cache.invalidate()
         return
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asesor not found or error during delete")
\ No newline at end of file
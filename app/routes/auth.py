@@ -1,5 +1,8 @@
+import asyncio
 import pytz
-from datetime import datetime, timedelta
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status, Response
@@ -13,6 +16,9 @@ from pwdlib import PasswordHash
 import time
 
 from app import schemas
+from app.cache import TTLCache
+from app.database import get_prisma_client
+from app.ritmo import Cubetas, limite, segundos_retry_after
 
 os.environ['TZ'] = 'America/Caracas'
 if hasattr(time, 'tzset'):
@@ -30,31 +36,100 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Cada cuánto cada worker trae de la base las sesiones revocadas
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
 
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable not set")
 
+# Caché de usuarios ya verificados: evita consultar la base en cada petición autenticada.
+# Cada worker tiene el suyo; el TTL corto acota cuánto tarda en verse un usuario deshabilitado
+# en los otros workers.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+class RevocationCache:
+    """Familias de refresh tokens revocadas, en memoria por worker.
+
+    Se sincroniza con la tabla RefreshToken como mucho cada REVOCATION_SYNC_SECONDS,
+    así que validar un token no consulta la base. Las revocaciones hechas por este
+    worker se aplican al instante; las de otros workers, en la siguiente sincronización.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._families: dict[str, datetime] = {}
+        self._synced_at: datetime | None = None
+        self._next_sync = 0.0
+        self._lock = asyncio.Lock()
+
+    def add(self, family: str, expires_at: datetime):
+        self._families[family] = max(expires_at, self._families.get(family, expires_at))
+
+    def is_revoked(self, family: str | None) -> bool:
+        return family is not None and family in self._families
+
+    async def sync(self, db: Prisma):
+        if time.monotonic() < self._next_sync:
+            return
+        async with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            now = datetime.now(timezone.utc)
+            where = {"revokedAt": {"not": None}, "expiresAt": {"gt": now}}
+            if self._synced_at is not None:
+                # Solo lo revocado desde la última vez (con margen por relojes)
+                where["revokedAt"] = {"gte": self._synced_at - timedelta(seconds=5)}
+            revoked = await db.refreshtoken.find_many(where=where)
+            for token in revoked:
+                self.add(token.family, token.expiresAt)
+            self._families = {f: exp for f, exp in self._families.items() if exp > now}
+            self._synced_at = now
+            self._next_sync = time.monotonic() + self.interval
+
+revocation_cache = RevocationCache(REVOCATION_SYNC_SECONDS)
+
 # Configuración de hashing moderna con pwdlib
 password_helper = PasswordHash.recommended()
 
+# argon2 bloquea decenas de ms por hash: se ejecuta en un pool propio para no frenar el
+# event loop. Si la cola se llena respondemos 503 de inmediato en vez de acumular esperas.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "16"))
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_pending = 0
+
+# Intentos de login por nombre de usuario (RATE_LIMIT_LOGIN): frena la fuerza bruta sobre una
+# cuenta sin castigar a los vendedores que comparten IP, que el middleware de admisión no distingue
+LIMITE_LOGIN = limite("login", 5, 10)
+intentos_login = Cubetas()
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Dependency to get a Prisma client instance
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
+async def run_in_hash_executor(fn, *args):
+    global _hash_pending
+    if _hash_pending >= HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas autenticaciones en curso, intente de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
     try:
-        yield db
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, fn, *args)
     finally:
-        await db.disconnect()
+        _hash_pending -= 1
 
 # Nuevas funciones de contraseña usando pwdlib
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_helper.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Devuelve (válida, hash_nuevo); hash_nuevo viene si el hash guardado usa parámetros viejos."""
+    return await run_in_hash_executor(password_helper.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return password_helper.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await run_in_hash_executor(password_helper.hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -69,12 +144,29 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 async def get_user_by_username(db: Prisma, username: str):
     return await db.user.find_unique(where={"username": username})
 
+async def get_cached_user(db: Prisma, username: str):
+    user = principal_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            principal_cache.set(username, user)
+    return user
+
+def invalidate_user(username: str):
+    """Llamar siempre que se deshabilite o modifique un usuario."""
+    principal_cache.invalidate(username)
+
 async def authenticate_user(db: Prisma, username: str, password: str):
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashedPassword):
+    valid, updated_hash = await verify_password(password, user.hashedPassword)
+    if not valid:
         return None
+    if updated_hash:
+        # Rehash transparente cuando cambian los parámetros del algoritmo
+        user = await db.user.update(where={"id": user.id}, data={"hashedPassword": updated_hash})
+        invalidate_user(user.username)
     return user
 
 async def get_current_user(
@@ -88,12 +180,15 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") == "refresh":
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = await get_user_by_username(db, username=token_data.username)
+    await revocation_cache.sync(db)
+    if revocation_cache.is_revoked(payload.get("fam")):
+        raise credentials_exception
+    user = await get_cached_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -109,6 +204,14 @@ async def get_current_active_user(
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Prisma = Depends(get_prisma_client)
 ):
+    # Antes de verificar la contraseña: el hash es lo caro
+    reintentar = intentos_login.tomar(form_data.username.strip().lower(), LIMITE_LOGIN)
+    if reintentar:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos de login, intente más tarde",
+            headers={"Retry-After": segundos_retry_after(reintentar)},
+        )
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -116,11 +219,77 @@ async def login_for_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return await issue_tokens(db, user.username, family=str(uuid.uuid4()))
+
+async def issue_tokens(db: Prisma, username: str, family: str) -> dict:
+    """Emite un access token y un refresh token nuevo dentro de la familia (sesión) dada."""
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": username, "fam": family}, expires_delta=access_token_expires
+    )
+    refresh_expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    refresh = await db.refreshtoken.create(
+        data={"family": family, "username": username, "expiresAt": refresh_expires_at}
+    )
+    refresh_token = jwt.encode(
+        {"sub": username, "type": "refresh", "jti": refresh.id, "fam": family, "exp": refresh_expires_at},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def revoke_family(db: Prisma, family: str):
+    now = datetime.now(timezone.utc)
+    await db.refreshtoken.update_many(where={"family": family, "revokedAt": None}, data={"revokedAt": now})
+    revocation_cache.add(family, now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+@router.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.RefreshTokenRequest, db: Prisma = Depends(get_prisma_client)):
+    payload = decode_refresh_token(body.refresh_token)
+    invalid_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    await revocation_cache.sync(db)
+    if revocation_cache.is_revoked(payload["fam"]):
+        raise invalid_exception
+
+    # Rotación atómica: solo una petición puede consumir este refresh token
+    rotated = await db.refreshtoken.update_many(
+        where={"id": payload["jti"], "rotatedAt": None, "revokedAt": None},
+        data={"rotatedAt": datetime.now(timezone.utc)},
+    )
+    if rotated == 0:
+        # Token ya usado o revocado: posible robo, se revoca toda la sesión
+        await revoke_family(db, payload["fam"])
+        raise invalid_exception
+
+    user = await get_cached_user(db, payload["sub"])
+    if user is None or user.disabled:
+        await revoke_family(db, payload["fam"])
+        raise invalid_exception
+    return await issue_tokens(db, user.username, family=payload["fam"])
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(body: schemas.RefreshTokenRequest, db: Prisma = Depends(get_prisma_client)):
+    # Cierra la sesión: invalida el refresh token y los access tokens emitidos con él
+    payload = decode_refresh_token(body.refresh_token)
+    await revoke_family(db, payload["fam"])
+    return None
 
 @router.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
 async def create_user(user: schemas.UserCreate, db: Prisma = Depends(get_prisma_client)):
@@ -128,7 +297,7 @@ async def create_user(user: schemas.UserCreate, db: Prisma = Depends(get_prisma_
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_data = user.dict()
     user_data.pop("password") 
     
@@ -138,6 +307,15 @@ async def create_user(user: schemas.UserCreate, db: Prisma = Depends(get_prisma_
             "hashedPassword": hashed_password,
         }
     )
+    invalidate_user(new_user.username)
+    return new_user
+
+@router.get("/users/cache", response_model=schemas.CacheStats)
+async def read_principal_cache_stats(
+    current_user: Annotated[schemas.User, Depends(get_current_active_user)]
+):
+    # Aciertos/fallos del caché de usuarios de este worker
+    return principal_cache.stats()
 
 @router.get("/users/me", response_model=schemas.User)
 async def read_users_me(
@@ -145,7 +323,3 @@ async def read_users_me(
     ):
     # Esta función usa el token enviado en los headers para buscar al usuario
     return current_user
-
-    new_user.createdAt = hora_local
-    new_user.updatedAt = hora_local
-    return new_user
\ No newline at end of file
@@ -1,19 +1,16 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from prisma import Prisma
+from typing import Literal, Optional, Union
 from app import schemas
+from app.cache import load_related
+from app.database import get_prisma_client
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_order, keyset_where, paginate
 from app.routes.auth import get_current_active_user # Import get_current_active_user
+from app.routes.sync import registrar_eliminacion
+from app.serializacion import lista_json, normalizado_json
 
 router = APIRouter()
 
-# Dependency to get a Prisma client instance
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
-
 
 @router.post("/clientes/", response_model=schemas.Cliente, status_code=status.HTTP_201_CREATED)
 async def create_cliente(
@@ -22,9 +19,9 @@ async def create_cliente(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        # Check if the idAsesor exists
-        asesor_exists = await db.asesor.find_unique(where={'idAsesor': cliente.idAsesor})
-        if not asesor_exists:
+        # Check if the idAsesor exists (from the in-memory catalog, no query)
+        asesores = await load_related(db, asesores={cliente.idAsesor})
+        if not asesores["asesores"]:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Asesor not found")
 
         created_cliente = await db.cliente.create(data={
@@ -44,13 +41,43 @@ async def create_cliente(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.get("/clientes/", response_model=list[schemas.Cliente])
+@router.get("/clientes/", response_model=Union[list[schemas.Cliente], schemas.ClientesNormalizados])
 async def read_clientes(
+    response: Response,
+    formato: Literal["anidado", "normalizado"] = "anidado",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    idAsesor: Optional[str] = None,
+    Zona: Optional[str] = None,
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    clientes = await db.cliente.find_many(include={'asesor': True})
-    return clientes
+    where = {}
+    if idAsesor:
+        where['idAsesor'] = idAsesor
+    if Zona:
+        where['Zona'] = Zona
+    where.update(keyset_where(cursor, 'idCliente'))
+
+    if formato == "normalizado":
+        # El asesor de cada cliente sale una sola vez en "included" (desde el catálogo en memoria)
+        clientes = paginate(await db.cliente.find_many(
+            where=where,
+            order=keyset_order('idCliente'),
+            take=limit + 1
+        ), limit, 'idCliente', response)
+        relacionados = await load_related(db, asesores={c.idAsesor for c in clientes})
+        return normalizado_json(schemas.ClientePlano, clientes, {
+            "asesores": (schemas.Asesor, relacionados["asesores"]),
+        }, response)
+
+    clientes = await db.cliente.find_many(
+        where=where,
+        include={'asesor': True},
+        order=keyset_order('idCliente'),
+        take=limit + 1
+    )
+    return lista_json(schemas.Cliente, paginate(clientes, limit, 'idCliente', response), response)
 
 
 @router.get("/clientes/{cliente_id}", response_model=schemas.Cliente)
@@ -73,10 +100,10 @@ async def update_cliente(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        # Check if the idAsesor exists if it's being updated
+        # Check if the idAsesor exists if it's being updated (from the in-memory catalog, no query)
         if cliente.idAsesor:
-            asesor_exists = await db.asesor.find_unique(where={'idAsesor': cliente.idAsesor})
-            if not asesor_exists:
+            asesores = await load_related(db, asesores={cliente.idAsesor})
+            if not asesores["asesores"]:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Asesor not found")
 
         updated_cliente = await db.cliente.update(
@@ -105,7 +132,10 @@ async def delete_cliente(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        await db.cliente.delete(where={'idCliente': cliente_id})
+        # El borrado deja una marca para que /sync se lo informe a los dispositivos
+        async with db.tx() as transaction:
+            await transaction.cliente.delete(where={'idCliente': cliente_id})
+            await registrar_eliminacion(transaction, "clientes", cliente_id, current_user.username)
         return
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente not found or error during delete")
\ No newline at end of file
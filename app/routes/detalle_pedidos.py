@@ -1,62 +1,96 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Response
 from prisma import Prisma
+from typing import Optional
 from app import schemas
+from app.cache import productos_cache
+from app.database import get_prisma_client
+from app.eventos import ACTUALIZADO, publicar
+from app.idempotencia import IDEMPOTENCY_HEADER, idempotente
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_order, keyset_where, paginate
+from app.resumen import porcion, refrescar_resumen
 from app.routes.auth import get_current_active_user
+from app.serializacion import lista_json
 
 router = APIRouter()
 
-# Dependency to get a Prisma client instance
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
+
+async def get_producto(db: Prisma, id_producto: str):
+    producto = (await productos_cache.get(db)).by_id.get(id_producto)
+    if producto is None:
+        # Puede ser un producto cargado fuera de la API que el caché aún no ve
+        producto = await db.producto.find_unique(where={'idProducto': id_producto})
+    return producto
 
 
 @router.post("/detalle_pedidos/", response_model=schemas.DetallePedido, status_code=status.HTTP_201_CREATED)
 async def create_detalle_pedido(
     detalle_pedido: schemas.DetallePedidoCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    try:
-        # Check if idPedido exists
-        pedido_exists = await db.pedido.find_unique(where={'idPedido': detalle_pedido.idPedido})
-        if not pedido_exists:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pedido not found")
-
-        # Check if idProducto exists and get its price
-        producto = await db.producto.find_unique(where={'idProducto': detalle_pedido.idProducto})
-        if not producto:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Producto not found")
+    async def crear():
+        try:
+            # Check if idPedido and idProducto exist (in parallel; the product comes from the in-memory catalog)
+            pedido_exists, producto = await asyncio.gather(
+                db.pedido.find_unique(where={'idPedido': detalle_pedido.idPedido}),
+                get_producto(db, detalle_pedido.idProducto)
+            )
+            if not pedido_exists:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pedido not found")
+            if not producto:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Producto not found")
         
-        # Calculate Total
-        precio_unitario = detalle_pedido.Precio if detalle_pedido.Precio > 0 else producto.Precio
-        total_calculated = precio_unitario * detalle_pedido.Cantidad
+            # Calculate Total
+            precio_unitario = detalle_pedido.Precio if detalle_pedido.Precio > 0 else producto.Precio
+            total_calculated = precio_unitario * detalle_pedido.Cantidad
 
-        created_detalle_pedido = await db.detallepedido.create(data={
-            "idPedido": detalle_pedido.idPedido,
-            "idProducto": detalle_pedido.idProducto,
-            "Precio": precio_unitario,
-            "Cantidad": detalle_pedido.Cantidad,
-            "Total": total_calculated,
-            "createdBy": current_user.username,
-            "updatedBy": current_user.username
-        })
+            created_detalle_pedido = await db.detallepedido.create(data={
+                "idPedido": detalle_pedido.idPedido,
+                "idProducto": detalle_pedido.idProducto,
+                "Precio": precio_unitario,
+                "Cantidad": detalle_pedido.Cantidad,
+                "Total": total_calculated,
+                "createdBy": current_user.username,
+                "updatedBy": current_user.username
+            })
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        await refrescar_resumen(db, [porcion(pedido_exists)])
+        await publicar(db, ACTUALIZADO, [pedido_exists], current_user.username)
         return created_detalle_pedido
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await idempotente(
+        db, idempotency_key, current_user.username, "POST /detalle_pedidos/", detalle_pedido.model_dump_json(),
+        crear, schemas.DetallePedido, status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.get("/detalle_pedidos/", response_model=list[schemas.DetallePedido])
 async def read_detalle_pedidos(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    idPedido: Optional[str] = None,
+    idProducto: Optional[str] = None,
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    detalle_pedidos = await db.detallepedido.find_many(include={'pedido': True, 'producto': True})
-    return detalle_pedidos
+    where = {}
+    if idPedido:
+        where['idPedido'] = idPedido
+    if idProducto:
+        where['idProducto'] = idProducto
+    where.update(keyset_where(cursor, 'id'))
+
+    detalle_pedidos = await db.detallepedido.find_many(
+        where=where,
+        include={'pedido': True, 'producto': True},
+        order=keyset_order('id'),
+        take=limit + 1
+    )
+    return lista_json(schemas.DetallePedido, paginate(detalle_pedidos, limit, 'id', response), response)
 
 
 @router.get("/detalle_pedidos/{detalle_pedido_id}", response_model=schemas.DetallePedido)
@@ -79,13 +113,13 @@ async def update_detalle_pedido(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        # Check if idPedido exists
-        pedido_exists = await db.pedido.find_unique(where={'idPedido': detalle_pedido.idPedido})
+        # Check if idPedido and idProducto exist (in parallel; the product comes from the in-memory catalog)
+        pedido_exists, producto = await asyncio.gather(
+            db.pedido.find_unique(where={'idPedido': detalle_pedido.idPedido}),
+            get_producto(db, detalle_pedido.idProducto)
+        )
         if not pedido_exists:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pedido not found")
-
-        # Check if idProducto exists and get its price
-        producto = await db.producto.find_unique(where={'idProducto': detalle_pedido.idProducto})
         if not producto:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Producto not found")
         
@@ -93,6 +127,9 @@ async def update_detalle_pedido(
         precio_unitario = detalle_pedido.Precio if detalle_pedido.Precio > 0 else producto.Precio
         total_calculated = precio_unitario * detalle_pedido.Cantidad
 
+        # Pedido al que pertenecía antes (la línea puede moverse a otro pedido)
+        anterior = await db.detallepedido.find_unique(where={'id': detalle_pedido_id}, include={'pedido': True})
+
         updated_detalle_pedido = await db.detallepedido.update(
             where={'id': detalle_pedido_id},
             data={
@@ -104,9 +141,16 @@ async def update_detalle_pedido(
                 "updatedBy": current_user.username
             }
         )
-        return updated_detalle_pedido
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DetallePedido not found or error during update")
+    porciones = [porcion(pedido_exists)]
+    afectados = {pedido_exists.idPedido: pedido_exists}
+    if anterior and anterior.pedido:
+        porciones.append(porcion(anterior.pedido))
+        afectados.setdefault(anterior.pedido.idPedido, anterior.pedido)
+    await refrescar_resumen(db, porciones)
+    await publicar(db, ACTUALIZADO, afectados.values(), current_user.username)
+    return updated_detalle_pedido
 
 
 @router.delete("/detalle_pedidos/{detalle_pedido_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -116,7 +160,10 @@ async def delete_detalle_pedido(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        await db.detallepedido.delete(where={'id': detalle_pedido_id})
-        return
+        eliminado = await db.detallepedido.delete(where={'id': detalle_pedido_id}, include={'pedido': True})
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DetallePedido not found or error during delete")
+    if eliminado and eliminado.pedido:
+        await refrescar_resumen(db, [porcion(eliminado.pedido)])
+        await publicar(db, ACTUALIZADO, [eliminado.pedido], current_user.username)
+    return
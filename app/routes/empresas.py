@@ -1,19 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from prisma import Prisma
 from app import schemas
+from app.database import get_prisma_client
+from app.numeracion import NUMERACION_MAX_BLOQUE, reservar_numeros
 from app.routes.auth import get_current_active_user
-from typing import List
+from typing import List, Literal
 
 router = APIRouter()
 
-# Dependencia para obtener la instancia de Prisma
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
 
 @router.post("/empresas/", response_model=schemas.Empresa, status_code=status.HTTP_201_CREATED)
 async def create_empresa(
@@ -71,22 +65,40 @@ async def update_empresa(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Error al actualizar la empresa")
 
 @router.put("/empresas/pedidos/{empresa_id}", response_model=schemas.Empresa)
-async def update_empresa(
+async def update_empresa_pedidos(
     empresa_id: int,
     empresa: schemas.EmpresaUpdatePedidos,
     db: Prisma = Depends(get_prisma_client),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
+    # Compatibilidad con clientes viejos: el contador solo avanza, nunca retrocede,
+    # aunque dos asesores envíen el mismo número. Los clientes nuevos deben usar
+    # POST /empresas/{empresa_id}/numeracion/pedido.
     try:
-        updated = await db.empresa.update(
-            where={'idEmpresa': empresa_id},
-            data={
-                'idPedido': empresa.idPedido+1
-            }
+        updated = await db.query_first(
+            'UPDATE "Empresa" SET "idPedido" = GREATEST("idPedido", $1 + 1) WHERE "idEmpresa" = $2 RETURNING *',
+            empresa.idPedido, empresa_id
         )
-        return updated
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Error al actualizar la empresa")
+    if updated is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empresa no encontrada")
+    return updated
+
+@router.post("/empresas/{empresa_id}/numeracion/{serie}", response_model=schemas.NumeracionReservada)
+async def reservar_numeracion(
+    empresa_id: int,
+    serie: Literal["pedido", "recibo"],
+    cantidad: int = Query(1, ge=1, le=NUMERACION_MAX_BLOQUE),
+    db: Prisma = Depends(get_prisma_client),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    # Reserva atómica de un bloque de números (p. ej. 50 para trabajar sin conexión)
+    rango = await reservar_numeros(db, empresa_id, serie, cantidad)
+    if rango is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empresa no encontrada")
+    desde, hasta = rango
+    return {"idEmpresa": empresa_id, "serie": serie, "desde": desde, "hasta": hasta, "cantidad": cantidad}
 
 
 
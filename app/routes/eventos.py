@@ -0,0 +1,101 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from prisma import Prisma
+
+from app.compresion import sin_compresion
+from app.database import db as prisma_db, get_prisma_client
+from app.eventos import EVENTOS_MAX_SUSCRIPTORES, Suscripcion, central, flujo
+from app.routes.auth import get_current_active_user, get_current_user
+
+router = APIRouter()
+
+# Cada cuánto se manda algo aunque no haya eventos (proxies y balanceadores cortan conexiones mudas)
+EVENTOS_LATIDO_SEGUNDOS = float(os.getenv("EVENTOS_LATIDO_SEGUNDOS", "15"))
+
+
+async def usuario_de_token(db: Prisma, token: Optional[str]):
+    # EventSource y WebSocket del navegador no pueden mandar Authorization: el token viaja en la URL
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await get_current_active_user(await get_current_user(token=token, db=db))
+
+
+def _hay_lugar():
+    if central.suscriptores >= EVENTOS_MAX_SUSCRIPTORES:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Demasiadas conexiones de eventos")
+
+
+# --- SSE ---
+@router.get("/eventos/pedidos")
+@sin_compresion
+async def eventos_pedidos_sse(
+    idAsesor: Optional[str] = None,
+    idEmpresa: Optional[int] = None,
+    desde: Optional[int] = Query(None, description="Último id recibido; también vale la cabecera Last-Event-ID"),
+    token: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    # scope="function": la dependencia termina al devolver la respuesta y el flujo abierto no
+    # cuenta como petición en curso (si no, cada apagado esperaría todo DB_DRAIN_TIMEOUT)
+    db: Prisma = Depends(get_prisma_client, scope="function")
+):
+    """Server-Sent Events con los cambios de pedidos (reemplaza el sondeo de GET /pedidos/).
+
+    Cada evento lleva `id` (para reanudar), `event` (pedido.creado, pedido.actualizado,
+    pedido.status, pedido.eliminado o reinicio) y en `data` el idPedido, idAsesor,
+    idEmpresa y Status; el pedido completo se pide con GET /pedidos/{id} si hace falta.
+    Al reconectar, EventSource reenvía Last-Event-ID y se repite lo perdido. `reinicio`
+    indica que hay que recargar la lista completa.
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    await usuario_de_token(db, token)
+    _hay_lugar()
+    if last_event_id and last_event_id.isdigit():
+        desde = int(last_event_id)
+
+    async def generar():
+        yield b"retry: 3000\n\n"
+        async for evento in flujo(db, Suscripcion(idAsesor, idEmpresa), desde, EVENTOS_LATIDO_SEGUNDOS):
+            if evento is None:
+                yield b": latido\n\n"
+            else:
+                yield f"id: {evento.id}\nevent: {evento.tipo}\ndata: {evento.datos}\n\n".encode()
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx no debe retener el flujo
+    )
+
+
+# --- WEBSOCKET ---
+@router.websocket("/eventos/pedidos/ws")
+async def eventos_pedidos_ws(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    idAsesor: Optional[str] = None,
+    idEmpresa: Optional[int] = None,
+    desde: Optional[int] = None,
+):
+    """Mismos eventos que /eventos/pedidos, como mensajes JSON de texto ({"tipo": "latido"} sin cambios)."""
+    # Cliente del módulo y no get_prisma_client: la sesión dura lo que la conexión y no debe
+    # contar como petición en curso al apagar (lifespan la cierra con central.cerrar())
+    try:
+        await usuario_de_token(prisma_db, token)
+        _hay_lugar()
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+    await websocket.accept()
+    try:
+        async for evento in flujo(prisma_db, Suscripcion(idAsesor, idEmpresa), desde, EVENTOS_LATIDO_SEGUNDOS):
+            # El cliente no envía nada; un cliente ido se detecta al fallar el envío (a más tardar en el latido)
+            await websocket.send_text(evento.datos if evento is not None else '{"tipo":"latido"}')
+    except WebSocketDisconnect:
+        return
+    # La Central se reinició o el cliente quedó atrás: que reconecte con su último id
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
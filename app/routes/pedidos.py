@@ -1,74 +1,334 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+import csv
+import io
+import os
+import zlib
+import orjson
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from prisma import Prisma
 from app import schemas
+from app.cache import load_related, productos_cache
+from app.database import get_prisma_client
+from app.eventos import ACTUALIZADO, CREADO, ELIMINADO, STATUS, publicar
+from app.idempotencia import IDEMPOTENCY_HEADER, idempotente
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, keyset_order, keyset_where, paginate
+from app.resumen import porcion, refrescar_resumen
 from app.routes.auth import get_current_active_user
-from typing import List
+from app.serializacion import lista_json, normalizado_json
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional, Union
 
 router = APIRouter()
 
-# Dependencia para conectar/desconectar Prisma en cada petición
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
+BULK_MAX_PEDIDOS = int(os.getenv("BULK_MAX_PEDIDOS", "500"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
 
 # --- CREATE (Crear Pedido con Detalles) ---
 @router.post("/pedidos/", response_model=schemas.Pedido, status_code=status.HTTP_201_CREATED)
 async def create_pedido(
     pedido: schemas.PedidoCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    try:
-        # Validación de integridad: ¿Existe el asesor y el cliente?
-        #async with db.batch_() as batch:
-        #    batch.asesor.find_unique(where={'idAsesor': pedido.idAsesor})
-        #    batch.cliente.find_unique(where={'idCliente': pedido.idCliente})
+    async def crear():
+        try:
+            # Validación de integridad: ¿Existe el asesor y el cliente?
+            #async with db.batch_() as batch:
+            #    batch.asesor.find_unique(where={'idAsesor': pedido.idAsesor})
+            #    batch.cliente.find_unique(where={'idCliente': pedido.idCliente})
 
-        # Creación atómica (Pedido + Detalles)
-        created_pedido = await db.pedido.create(
-            data={
-                "idPedido": pedido.idPedido,
-                "idEmpresa": pedido.idEmpresa,
-                "fechaPedido": pedido.fechaPedido,
-                "totalPedido": pedido.totalPedido,
-                "Status": pedido.Status,
-                "createdBy": current_user.username,
-                "updatedBy": current_user.username,
-                "asesor": {"connect": {"idAsesor": pedido.idAsesor}},
-                "cliente": {"connect": {"idCliente": pedido.idCliente}},
-                "detalles": {
-                    "create": [
-                        {
-                            "idProducto": d.idProducto,
-                            "Precio": d.Precio,
-                            "Cantidad": d.Cantidad,
-                            "Total": d.Precio * d.Cantidad,
-                            "createdBy": current_user.username,
-                            "updatedBy": current_user.username
-                        } for d in pedido.detalles
-                    ]
-                }
-            },
-            include={"detalles": True, "asesor": True, "cliente": True}
-        )
+            # Creación atómica (Pedido + Detalles)
+            created_pedido = await db.pedido.create(
+                data={
+                    "idPedido": pedido.idPedido,
+                    "idEmpresa": pedido.idEmpresa,
+                    "fechaPedido": pedido.fechaPedido,
+                    "totalPedido": pedido.totalPedido,
+                    "Status": pedido.Status,
+                    "createdBy": current_user.username,
+                    "updatedBy": current_user.username,
+                    "asesor": {"connect": {"idAsesor": pedido.idAsesor}},
+                    "cliente": {"connect": {"idCliente": pedido.idCliente}},
+                    "detalles": {
+                        "create": [
+                            {
+                                "idProducto": d.idProducto,
+                                "Precio": d.Precio,
+                                "Cantidad": d.Cantidad,
+                                "Total": d.Precio * d.Cantidad,
+                                "createdBy": current_user.username,
+                                "updatedBy": current_user.username
+                            } for d in pedido.detalles
+                        ]
+                    }
+                },
+                include={"detalles": True, "asesor": True, "cliente": True}
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error al crear: {str(e)}")
+        await refrescar_resumen(db, [porcion(created_pedido)])
+        await publicar(db, CREADO, [created_pedido], current_user.username)
         return created_pedido
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error al crear: {str(e)}")
+
+    # Con Idempotency-Key, un reintento recibe la respuesta guardada sin volver a crear
+    return await idempotente(
+        db, idempotency_key, current_user.username, "POST /pedidos/", pedido.model_dump_json(),
+        crear, schemas.Pedido, status_code=status.HTTP_201_CREATED
+    )
+
+# --- BULK CREATE (Sincronización de pedidos tomados sin conexión) ---
+@router.post("/pedidos/bulk", response_model=schemas.PedidoBulkRespuesta)
+async def create_pedidos_bulk(
+    pedidos: List[schemas.PedidoCreate],
+    parcial: bool = False,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Prisma = Depends(get_prisma_client)
+):
+    if len(pedidos) > BULK_MAX_PEDIDOS:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Máximo {BULK_MAX_PEDIDOS} pedidos por lote")
+
+    # Validación por conjuntos: una consulta por entidad, no una por pedido
+    ids_productos = {d.idProducto for p in pedidos for d in p.detalles}
+    existentes, asesores, clientes, catalogo = await asyncio.gather(
+        db.pedido.find_many(where={'idPedido': {'in': list({p.idPedido for p in pedidos})}}),
+        db.asesor.find_many(where={'idAsesor': {'in': list({p.idAsesor for p in pedidos})}}),
+        db.cliente.find_many(where={'idCliente': {'in': list({p.idCliente for p in pedidos})}}),
+        productos_cache.get(db),
+    )
+    ids_existentes = {p.idPedido for p in existentes}
+    ids_asesores = {a.idAsesor for a in asesores}
+    ids_clientes = {c.idCliente for c in clientes}
+    ids_faltantes = ids_productos - catalogo.by_id.keys()
+    if ids_faltantes:
+        # Productos que el caché aún no ve (cargados fuera de la API)
+        encontrados = await db.producto.find_many(where={'idProducto': {'in': list(ids_faltantes)}})
+        ids_faltantes -= {p.idProducto for p in encontrados}
+
+    resultados = []
+    validos = []
+    vistos = set()
+    for p in pedidos:
+        productos_invalidos = {d.idProducto for d in p.detalles} & ids_faltantes
+        if p.idPedido in ids_existentes or p.idPedido in vistos:
+            resultados.append(schemas.PedidoBulkResultado(idPedido=p.idPedido, estado="duplicate"))
+        elif p.idAsesor not in ids_asesores:
+            resultados.append(schemas.PedidoBulkResultado(idPedido=p.idPedido, estado="error", detalle="Asesor no encontrado"))
+        elif p.idCliente not in ids_clientes:
+            resultados.append(schemas.PedidoBulkResultado(idPedido=p.idPedido, estado="error", detalle="Cliente no encontrado"))
+        elif productos_invalidos:
+            resultados.append(schemas.PedidoBulkResultado(
+                idPedido=p.idPedido, estado="error", detalle=f"Productos no encontrados: {', '.join(sorted(productos_invalidos))}"
+            ))
+        else:
+            resultados.append(schemas.PedidoBulkResultado(idPedido=p.idPedido, estado="created"))
+            validos.append(p)
+        vistos.add(p.idPedido)
+
+    hay_errores = any(r.estado == "error" for r in resultados)
+    if hay_errores and not parcial:
+        # Todo o nada: no se inserta ningún pedido del lote
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=[r.model_dump() for r in resultados if r.estado == "error"]
+        )
+
+    if validos:
+        try:
+            # Dos INSERT multi-fila (pedidos y detalles) en una sola transacción
+            async with db.tx(timeout=timedelta(seconds=30)) as transaction:
+                await transaction.pedido.create_many(data=[
+                    {
+                        "idPedido": p.idPedido,
+                        "idEmpresa": p.idEmpresa,
+                        "fechaPedido": p.fechaPedido,
+                        "totalPedido": p.totalPedido,
+                        "Status": p.Status,
+                        "idAsesor": p.idAsesor,
+                        "idCliente": p.idCliente,
+                        "createdBy": current_user.username,
+                        "updatedBy": current_user.username
+                    } for p in validos
+                ])
+                detalles = [
+                    {
+                        "idPedido": p.idPedido,
+                        "idProducto": d.idProducto,
+                        "Precio": d.Precio,
+                        "Cantidad": d.Cantidad,
+                        "Total": d.Precio * d.Cantidad,
+                        "createdBy": current_user.username,
+                        "updatedBy": current_user.username
+                    } for p in validos for d in p.detalles
+                ]
+                if detalles:
+                    await transaction.detallepedido.create_many(data=detalles)
+                await publicar(transaction, CREADO, validos, current_user.username)
+            await refrescar_resumen(db, [porcion(p) for p in validos])
+        except Exception as e:
+            # Falló la transacción (p. ej. un idPedido insertado en paralelo): nada quedó creado
+            for r in resultados:
+                if r.estado == "created":
+                    r.estado = "error"
+                    r.detalle = f"Error al crear: {str(e)}"
+
+    return schemas.PedidoBulkRespuesta(
+        creados=sum(r.estado == "created" for r in resultados),
+        duplicados=sum(r.estado == "duplicate" for r in resultados),
+        errores=sum(r.estado == "error" for r in resultados),
+        resultados=resultados
+    )
 
 # --- READ ALL (Listar con Detalles) ---
-@router.get("/pedidos/", response_model=List[schemas.Pedido])
+@router.get("/pedidos/", response_model=Union[List[schemas.Pedido], schemas.PedidosNormalizados])
 async def read_pedidos(
+    response: Response,
+    formato: Literal["anidado", "normalizado"] = "anidado",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    idAsesor: Optional[str] = None,
+    idCliente: Optional[str] = None,
+    Status: Optional[str] = None,
+    idEmpresa: Optional[int] = None,
+    fechaDesde: Optional[datetime] = None,
+    fechaHasta: Optional[datetime] = None,
     db: Prisma = Depends(get_prisma_client),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
+    # Filtros del lado del servidor
+    where = {}
+    if idAsesor:
+        where["idAsesor"] = idAsesor
+    if idCliente:
+        where["idCliente"] = idCliente
+    if Status:
+        where["Status"] = Status
+    if idEmpresa is not None:
+        where["idEmpresa"] = idEmpresa
+    if fechaDesde or fechaHasta:
+        where["fechaPedido"] = {}
+        if fechaDesde:
+            where["fechaPedido"]["gte"] = fechaDesde
+        if fechaHasta:
+            where["fechaPedido"]["lte"] = fechaHasta
+    where.update(keyset_where(cursor, "idPedido"))
+
+    if formato == "normalizado":
+        # Sin JOIN a asesor/cliente: cada relación se envía una vez en "included"
+        pedidos = paginate(await db.pedido.find_many(
+            where=where,
+            include={"detalles": True},
+            order=keyset_order("idPedido"),
+            take=limit + 1
+        ), limit, "idPedido", response)
+        relacionados = await load_related(
+            db,
+            asesores={p.idAsesor for p in pedidos},
+            clientes={p.idCliente for p in pedidos},
+            productos={d.idProducto for p in pedidos for d in p.detalles or []}
+        )
+        return normalizado_json(schemas.PedidoPlano, pedidos, {
+            "asesores": (schemas.Asesor, relacionados["asesores"]),
+            "clientes": (schemas.ClientePlano, relacionados["clientes"]),
+            "productos": (schemas.Producto, relacionados["productos"]),
+        }, response)
+
     # 'include' es vital para traer las relaciones y que no lleguen vacías
-    return await db.pedido.find_many(
+    pedidos = await db.pedido.find_many(
+        where=where,
         include={"detalles": True, "asesor": True, "cliente": True},
-        order={"createdAt": "desc"}
+        order=keyset_order("idPedido"),
+        take=limit + 1
+    )
+    # Filas de la base: se serializan directo, sin revalidar cada pedido con sus detalles
+    return lista_json(schemas.Pedido, paginate(pedidos, limit, "idPedido", response), response)
+
+# --- EXPORT (Descarga en streaming para contabilidad) ---
+# Debe declararse antes de /pedidos/{pedido_id} para que "export" no se tome como un id
+CSV_COLUMNAS = [
+    "idPedido", "idEmpresa", "fechaPedido", "Status", "idAsesor", "idCliente", "totalPedido",
+    "idDetalle", "idProducto", "Precio", "Cantidad", "Total"
+]
+
+def _ndjson(pedidos) -> bytes:
+    return b"".join(
+        orjson.dumps(p.model_dump(exclude={"asesor": True, "cliente": True, "detalles": {"__all__": {"pedido", "producto"}}})) + b"\n"
+        for p in pedidos
+    )
+
+def _csv(pedidos) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for p in pedidos:
+        cabecera = [p.idPedido, p.idEmpresa, p.fechaPedido.isoformat(), p.Status, p.idAsesor, p.idCliente, p.totalPedido]
+        # Una fila por línea de detalle; los pedidos sin detalles salen con las columnas vacías
+        for d in p.detalles or [None]:
+            writer.writerow(cabecera + ([d.id, d.idProducto, d.Precio, d.Cantidad, d.Total] if d else [""] * 5))
+    return buffer.getvalue().encode()
+
+async def _exportar_pedidos(db: Prisma, where: dict, formato: str, comprimir: bool):
+    # Lotes acotados por cursor: la memoria no depende del tamaño del rango exportado
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    serializar = _csv if formato == "csv" else _ndjson
+
+    def salida(data: bytes) -> bytes:
+        return compresor.compress(data) if compresor else data
+
+    if formato == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_COLUMNAS)
+        yield salida(buffer.getvalue().encode())
+
+    cursor = None
+    while True:
+        lote = await db.pedido.find_many(
+            where={**where, **keyset_where(cursor, "idPedido")},
+            include={"detalles": True},
+            order=keyset_order("idPedido"),
+            take=EXPORT_BATCH_SIZE
+        )
+        if lote:
+            data = salida(serializar(lote))
+            if data:
+                yield data
+        if len(lote) < EXPORT_BATCH_SIZE:
+            break
+        cursor = encode_cursor(lote[-1].createdAt, lote[-1].idPedido)
+
+    if compresor:
+        yield compresor.flush()
+
+@router.get("/pedidos/export")
+async def export_pedidos(
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    fechaDesde: Optional[datetime] = None,
+    fechaHasta: Optional[datetime] = None,
+    idAsesor: Optional[str] = None,
+    Status: Optional[str] = None,
+    gzip: bool = False,
+    db: Prisma = Depends(get_prisma_client),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    where = {}
+    if idAsesor:
+        where["idAsesor"] = idAsesor
+    if Status:
+        where["Status"] = Status
+    if fechaDesde or fechaHasta:
+        where["fechaPedido"] = {}
+        if fechaDesde:
+            where["fechaPedido"]["gte"] = fechaDesde
+        if fechaHasta:
+            where["fechaPedido"]["lte"] = fechaHasta
+
+    headers = {"Content-Disposition": f'attachment; filename="pedidos.{formato}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _exportar_pedidos(db, where, formato, gzip),
+        media_type="text/csv" if formato == "csv" else "application/x-ndjson",
+        headers=headers
     )
 
 # --- READ ONE (Obtener por ID) ---
@@ -86,7 +346,64 @@ async def read_pedido(
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     return pedido
 
-# --- UPDATE (Actualizar Pedido y Reemplazar Detalles) ---
+# --- UPDATE (Actualizar Pedido y sus Detalles por diferencia) ---
+def diff_detalles(existentes, nuevos):
+    """Empareja las líneas enviadas con las guardadas; devuelve (crear, actualizar, borrar).
+
+    Primero por id de línea y luego por idProducto (en orden, por si un producto se repite).
+    Las líneas emparejadas sin cambios no se tocan: no generan escritura ni cambian su updatedAt.
+    """
+    por_id = {d.id: d for d in existentes}
+    libres = list(existentes)
+    emparejadas = []
+    sin_pareja = []
+    for linea in nuevos:
+        actual = por_id.get(linea.id) if linea.id else None
+        if actual is None or actual not in libres:
+            actual = next((d for d in libres if d.idProducto == linea.idProducto), None)
+        if actual is None:
+            sin_pareja.append(linea)
+        else:
+            libres.remove(actual)
+            emparejadas.append((actual, linea))
+
+    actualizar = [
+        (actual.id, linea) for actual, linea in emparejadas
+        if (actual.idProducto, actual.Precio, actual.Cantidad, actual.Total)
+        != (linea.idProducto, linea.Precio, linea.Cantidad, linea.Precio * linea.Cantidad)
+    ]
+    return sin_pareja, actualizar, [d.id for d in libres]
+
+async def aplicar_detalles(transaction: Prisma, pedido_id: str, existentes, nuevos, usuario: str) -> int:
+    """Escribe solo las diferencias dentro de la transacción; devuelve las filas tocadas."""
+    crear, actualizar, borrar = diff_detalles(existentes, nuevos)
+    if borrar:
+        await transaction.detallepedido.delete_many(where={'id': {'in': borrar}})
+    for id_linea, d in actualizar:
+        await transaction.detallepedido.update(
+            where={'id': id_linea},
+            data={
+                "idProducto": d.idProducto,
+                "Precio": d.Precio,
+                "Cantidad": d.Cantidad,
+                "Total": d.Precio * d.Cantidad,
+                "updatedBy": usuario
+            }
+        )
+    if crear:
+        await transaction.detallepedido.create_many(data=[
+            {
+                "idPedido": pedido_id,
+                "idProducto": d.idProducto,
+                "Precio": d.Precio,
+                "Cantidad": d.Cantidad,
+                "Total": d.Precio * d.Cantidad,
+                "createdBy": usuario,
+                "updatedBy": usuario
+            } for d in crear
+        ])
+    return len(crear) + len(actualizar) + len(borrar)
+
 @router.put("/pedidos/{pedido_id}", response_model=schemas.Pedido)
 async def update_pedido(
     pedido_id: str,
@@ -96,39 +413,157 @@ async def update_pedido(
 ):
     try:
         async with db.tx() as transaction:
-            # 1. Borrar detalles asociados al pedido_id
-            await transaction.detallepedido.delete_many(
-                where={'idPedido': pedido_id}
+            # 1. Bloquear el pedido: dos ediciones simultáneas no calculan la diferencia sobre la misma foto
+            bloqueado = await transaction.query_raw(
+                'SELECT "idPedido" FROM "Pedido" WHERE "idPedido" = $1 FOR UPDATE', pedido_id
             )
+            if not bloqueado:
+                raise HTTPException(status_code=404, detail="Pedido no encontrado")
+            anterior = await transaction.pedido.find_unique(where={'idPedido': pedido_id}, include={"detalles": True})
 
-            # 2. Actualizar el pedido y crear los nuevos detalles
-            updated_pedido = await transaction.pedido.update(
-                where={'idPedido': pedido_id},
-                data={
-                    "fechaPedido": pedido.fechaPedido,
-                    "totalPedido": pedido.totalPedido,
-                    "Status": pedido.Status,
-                    "updatedBy": current_user.username,
-                    "asesor": {"connect": {"idAsesor": pedido.idAsesor}},
-                    "cliente": {"connect": {"idCliente": pedido.idCliente}},
-                    "detalles": {
-                        "create": [
-                            {
-                                "idProducto": d.idProducto,
-                                "Precio": d.Precio,
-                                "Cantidad": d.Cantidad,
-                                "Total": d.Precio * d.Cantidad,
-                                "createdBy": current_user.username,
-                                "updatedBy": current_user.username
-                            } for d in pedido.detalles
-                        ]
+            # 2. Solo se escriben las líneas nuevas, cambiadas o eliminadas
+            lineas = await aplicar_detalles(transaction, pedido_id, anterior.detalles, pedido.detalles, current_user.username)
+
+            # 3. La cabecera se actualiza si cambió algo (también si solo cambiaron líneas, para su updatedAt)
+            cabecera = {
+                "fechaPedido": pedido.fechaPedido,
+                "totalPedido": pedido.totalPedido,
+                "Status": pedido.Status,
+                "idAsesor": pedido.idAsesor,
+                "idCliente": pedido.idCliente,
+            }
+            cambiados = {campo for campo, valor in cabecera.items() if getattr(anterior, campo) != valor}
+            # Prisma devuelve la fecha con zona y el cliente puede mandarla sin ella: se comparan en UTC
+            if _utc_naive(anterior.fechaPedido) == _utc_naive(pedido.fechaPedido):
+                cambiados.discard("fechaPedido")
+            if lineas or cambiados:
+                await transaction.pedido.update(
+                    where={'idPedido': pedido_id},
+                    data={
+                        "fechaPedido": pedido.fechaPedido,
+                        "totalPedido": pedido.totalPedido,
+                        "Status": pedido.Status,
+                        "updatedBy": current_user.username,
+                        "asesor": {"connect": {"idAsesor": pedido.idAsesor}},
+                        "cliente": {"connect": {"idCliente": pedido.idCliente}}
                     }
-                },
+                )
+            updated_pedido = await transaction.pedido.find_unique(
+                where={'idPedido': pedido_id},
+                include={"detalles": True, "asesor": True, "cliente": True}
+            )
+            if lineas or cambiados:
+                tipo = STATUS if cambiados == {"Status"} and not lineas else ACTUALIZADO
+                await publicar(transaction, tipo, [updated_pedido], current_user.username)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al actualizar: {str(e)}")
+    # Si cambió la fecha, el asesor o el cliente, el pedido sale de una porción y entra en otra
+    await refrescar_resumen(db, [porcion(anterior), porcion(updated_pedido)])
+    return updated_pedido
+
+# --- PATCH (Cambio de Status / cabecera sin reenviar los detalles) ---
+def _utc_naive(fecha: datetime) -> str:
+    # Las columnas DateTime de Prisma son timestamp sin zona, guardadas en UTC
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha.isoformat()
+
+@router.patch("/pedidos/bulk/status", response_model=schemas.PedidoStatusMasivoRespuesta)
+async def update_pedidos_status(
+    cambio: schemas.PedidoStatusMasivo,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Prisma = Depends(get_prisma_client)
+):
+    params = [cambio.Status, current_user.username, _utc_naive(datetime.now(timezone.utc))]
+    condiciones = []
+
+    def param(valor) -> str:
+        params.append(valor)
+        return f"${len(params)}"
+
+    if cambio.idPedidos is not None:
+        if not cambio.idPedidos:
+            return schemas.PedidoStatusMasivoRespuesta(actualizados=0, idPedidos=[])
+        if len(cambio.idPedidos) > BULK_MAX_PEDIDOS:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Máximo {BULK_MAX_PEDIDOS} pedidos por lote")
+        condiciones.append(f'"idPedido" IN ({", ".join(param(i) for i in dict.fromkeys(cambio.idPedidos))})')
+    if cambio.statusActual:
+        condiciones.append(f'"Status" = {param(cambio.statusActual)}')
+    if cambio.idAsesor:
+        condiciones.append(f'"idAsesor" = {param(cambio.idAsesor)}')
+    if cambio.idCliente:
+        condiciones.append(f'"idCliente" = {param(cambio.idCliente)}')
+    if cambio.idEmpresa is not None:
+        condiciones.append(f'"idEmpresa" = {param(cambio.idEmpresa)}')
+    if cambio.fechaDesde:
+        condiciones.append(f'"fechaPedido" >= {param(_utc_naive(cambio.fechaDesde))}::timestamp')
+    if cambio.fechaHasta:
+        condiciones.append(f'"fechaPedido" <= {param(_utc_naive(cambio.fechaHasta))}::timestamp')
+    if not condiciones:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indique idPedidos o al menos un filtro")
+
+    try:
+        # Una sola sentencia; los pedidos que ya tienen el Status destino no se reescriben
+        actualizados = await db.pedido.query_raw(
+            'UPDATE "Pedido" SET "Status" = $1, "updatedBy" = $2, "updatedAt" = $3::timestamp '
+            f'WHERE {" AND ".join(condiciones)} AND "Status" IS DISTINCT FROM $1 '
+            'RETURNING *',
+            *params
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al actualizar: {str(e)}")
+    await refrescar_resumen(db, [porcion(p) for p in actualizados])
+    await publicar(db, STATUS, actualizados, current_user.username)
+    return schemas.PedidoStatusMasivoRespuesta(
+        actualizados=len(actualizados),
+        idPedidos=[p.idPedido for p in actualizados]
+    )
+
+@router.patch("/pedidos/{pedido_id}", response_model=schemas.Pedido)
+async def patch_pedido(
+    pedido_id: str,
+    cambios: schemas.PedidoPatch,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Prisma = Depends(get_prisma_client)
+):
+    campos = cambios.model_dump(exclude_unset=True, exclude_none=True, exclude={"updatedAt"})
+    data = {k: v for k, v in campos.items() if k not in ("idAsesor", "idCliente")}
+    if "idAsesor" in campos:
+        data["asesor"] = {"connect": {"idAsesor": campos["idAsesor"]}}
+    if "idCliente" in campos:
+        data["cliente"] = {"connect": {"idCliente": campos["idCliente"]}}
+    try:
+        async with db.tx() as transaction:
+            bloqueado = await transaction.query_raw(
+                'SELECT "idPedido" FROM "Pedido" WHERE "idPedido" = $1 FOR UPDATE', pedido_id
+            )
+            if not bloqueado:
+                raise HTTPException(status_code=404, detail="Pedido no encontrado")
+            anterior = await transaction.pedido.find_unique(where={'idPedido': pedido_id})
+            if cambios.updatedAt is not None and _utc_naive(anterior.updatedAt) != _utc_naive(cambios.updatedAt):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"El pedido fue modificado por {anterior.updatedBy} ({anterior.updatedAt.isoformat()})"
+                )
+            if data:
+                data["updatedBy"] = current_user.username
+                await transaction.pedido.update(where={'idPedido': pedido_id}, data=data)
+            updated_pedido = await transaction.pedido.find_unique(
+                where={'idPedido': pedido_id},
                 include={"detalles": True, "asesor": True, "cliente": True}
             )
-        return updated_pedido
+            if data:
+                tipo = STATUS if campos.keys() == {"Status"} else ACTUALIZADO
+                await publicar(transaction, tipo, [updated_pedido], current_user.username)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al actualizar: {str(e)}")
+    if data:
+        await refrescar_resumen(db, [porcion(anterior), porcion(updated_pedido)])
+    return updated_pedido
 
 # --- DELETE (Eliminar Pedido y sus Detalles) ---
 @router.delete("/pedidos/{pedido_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -141,7 +576,10 @@ async def delete_pedido(
         # En Prisma, si configuraste la relación correctamente, 
         # puedes borrar el pedido y los detalles se borrarán si hay cascade,
         # pero para estar seguros lo hacemos manual o Prisma lo maneja por el ID.
-        await db.pedido.delete(where={'idPedido': pedido_id})
-        return None
+        eliminado = await db.pedido.delete(where={'idPedido': pedido_id})
     except Exception as e:
-        raise HTTPException(status_code=404, detail="Error al eliminar el pedido")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Error al eliminar el pedido")
+    if eliminado:
+        await refrescar_resumen(db, [porcion(eliminado)])
+        await publicar(db, ELIMINADO, [eliminado], current_user.username)
+    return None
\ No newline at end of file
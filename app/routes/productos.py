@@ -1,19 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from prisma import Prisma
 from app import schemas
+from app.cache import productos_cache, not_modified
+from app.database import get_prisma_client
 from .auth import get_current_active_user
+from .sync import registrar_eliminacion
+from app.serializacion import lista_json
 
 router = APIRouter()
 
-# Dependency to get a Prisma client instance
-async def get_prisma_client():
-    db = Prisma()
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
-
 
 @router.post("/productos/", response_model=schemas.Producto, status_code=status.HTTP_201_CREATED)
 async def create_producto(
@@ -28,6 +23,7 @@ async def create_producto(
             "createdBy": current_user.username,
             "updatedBy": current_user.username
         })
+        productos_cache.invalidate()
         return created_producto
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -35,11 +31,16 @@ async def create_producto(
 
 @router.get("/productos/", response_model=list[schemas.Producto])
 async def read_productos(
+    request: Request,
+    response: Response,
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    productos = await db.producto.find_many()
-    return productos
+    catalogo = await productos_cache.get(db)
+    if not_modified(request, catalogo.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": catalogo.etag})
+    response.headers["ETag"] = catalogo.etag
+    return lista_json(schemas.Producto, catalogo.rows, response)
 
 
 @router.get("/productos/{producto_id}", response_model=schemas.Producto)
@@ -48,7 +49,10 @@ async def read_producto(
     current_user: schemas.User = Depends(get_current_active_user),
     db: Prisma = Depends(get_prisma_client)
 ):
-    producto = await db.producto.find_unique(where={'idProducto': producto_id})
+    producto = (await productos_cache.get(db)).by_id.get(producto_id)
+    if producto is None:
+        # Puede ser un producto cargado fuera de la API que el caché aún no ve
+        producto = await db.producto.find_unique(where={'idProducto': producto_id})
     if producto is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto not found")
     return producto
@@ -70,6 +74,7 @@ async def update_producto(
                 'updatedBy': current_user.username
             }
         )
+        productos_cache.invalidate()
         return updated_producto
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto not found or error during update")
@@ -82,7 +87,11 @@ async def delete_producto(
     db: Prisma = Depends(get_prisma_client)
 ):
     try:
-        await db.producto.delete(where={'idProducto': producto_id})
+        # El borrado deja una marca para que /sync se lo informe a los dispositivos
+        async with db.tx() as transaction:
+            await transaction.producto.delete(where={'idProducto': producto_id})
+            await registrar_eliminacion(transaction, "productos", producto_id, current_user.username)
+        productos_cache.invalidate()
         return
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto not found or error during delete")
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, status, Depends
+from prisma import Prisma
+from app import schemas
+from app.database import get_prisma_client
+from app.resumen import dia_local
+from app.routes.auth import get_current_active_user
+
+router = APIRouter()
+
+# Agrupación -> (tabla de resumen, columna clave, JOIN para el nombre, columna nombre)
+# La zona es la actual del cliente, no la que tenía al momento del pedido.
+AGRUPACIONES = {
+    "asesor": ("ResumenPedidoDiario", 'r."idAsesor"', 'LEFT JOIN "Asesor" a ON a."idAsesor" = r."idAsesor"', 'a."Asesor"'),
+    "cliente": ("ResumenPedidoDiario", 'r."idCliente"', 'LEFT JOIN "Cliente" c ON c."idCliente" = r."idCliente"', 'c."Cliente"'),
+    "zona": ("ResumenPedidoDiario", 'c."Zona"', 'JOIN "Cliente" c ON c."idCliente" = r."idCliente"', 'c."Zona"'),
+    "producto": ("ResumenVentaDiaria", 'r."idProducto"', 'LEFT JOIN "Producto" pr ON pr."idProducto" = r."idProducto"', 'pr."Producto"'),
+}
+PERIODOS = {"dia": "day", "semana": "week", "mes": "month"}
+
+REPORTE_MAX_DIAS = 731
+
+
+@router.get("/reportes/ventas", response_model=List[schemas.ReporteVentasFila])
+async def reporte_ventas(
+    agrupar: Literal["asesor", "zona", "cliente", "producto"] = "asesor",
+    periodo: Literal["dia", "semana", "mes"] = "mes",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    Status: Optional[str] = None,
+    idAsesor: Optional[str] = None,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Prisma = Depends(get_prisma_client)
+):
+    # Fechas en días locales (Caracas), ambos extremos incluidos; por defecto los últimos 30 días
+    hasta = hasta or dia_local(datetime.now(timezone.utc))
+    desde = desde or hasta - timedelta(days=30)
+    if desde > hasta:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'desde' debe ser anterior a 'hasta'")
+    if (hasta - desde).days > REPORTE_MAX_DIAS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Rango máximo: {REPORTE_MAX_DIAS} días")
+
+    tabla, clave, join, nombre = AGRUPACIONES[agrupar]
+    params = [PERIODOS[periodo], desde.isoformat(), hasta.isoformat()]
+    filtros = ['r."fecha" BETWEEN $2::date AND $3::date']
+    if Status:
+        params.append(Status)
+        filtros.append(f'r."Status" = ${len(params)}')
+    if idAsesor:
+        params.append(idAsesor)
+        filtros.append(f'r."idAsesor" = ${len(params)}')
+
+    filas = await db.query_raw(
+        f'SELECT date_trunc($1::text, r."fecha"::timestamp)::date AS periodo, {clave} AS clave, '
+        f'MAX({nombre}) AS nombre, SUM(r."pedidos")::int AS pedidos, SUM(r."cantidad")::int AS cantidad, '
+        f'SUM(r."total")::float8 AS total '
+        f'FROM "{tabla}" r {join} '
+        f'WHERE {" AND ".join(filtros)} '
+        f'GROUP BY 1, 2 ORDER BY 1, total DESC',
+        *params
+    )
+    return filas
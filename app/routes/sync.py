@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, status, Depends
+from prisma import Prisma
+from app import schemas
+from app.database import get_prisma_client
+from app.routes.auth import get_current_active_user
+
+router = APIRouter()
+
+# Solape entre sincronizaciones: una transacción que fijó su updatedAt antes del corte
+# pero confirmó después sigue entrando en la próxima sincronización si tarda menos que esto.
+SYNC_MARGIN_SECONDS = int(os.getenv("SYNC_MARGIN_SECONDS", "60"))
+# Marcas de borrado más viejas que esto pueden depurarse; un token anterior recibe todo de nuevo
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+
+ENTIDADES = ("clientes", "productos", "asesores")
+
+
+async def registrar_eliminacion(db: Prisma, entidad: str, id_registro: str, usuario: str):
+    """Deja la marca de borrado (tombstone); llamar dentro de la misma transacción del delete."""
+    await db.registroeliminado.create(data={
+        "entidad": entidad,
+        "idRegistro": id_registro,
+        "deletedAt": datetime.now(timezone.utc),
+        "deletedBy": usuario
+    })
+
+
+def encode_sync_token(corte: datetime) -> str:
+    return base64.urlsafe_b64encode(corte.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_sync_token(since: str) -> datetime:
+    # Acepta el token devuelto por /sync o directamente una fecha ISO
+    candidatos = [since]
+    try:
+        candidatos.append(base64.urlsafe_b64decode(since + "=" * (-len(since) % 4)).decode())
+    except ValueError:
+        pass
+    for texto in candidatos:
+        try:
+            fecha = datetime.fromisoformat(texto)
+        except ValueError:
+            continue
+        return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token de sincronización inválido")
+
+
+@router.get("/sync", response_model=schemas.SyncRespuesta)
+async def sync(
+    since: Optional[str] = None,
+    current_user: schemas.User = Depends(get_current_active_user),
+    db: Prisma = Depends(get_prisma_client)
+):
+    ahora = datetime.now(timezone.utc)
+    desde = decode_sync_token(since) if since else None
+    completo = desde is None or desde < ahora - timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+    # Siempre se lee hasta "ahora"; el token nuevo queda SYNC_MARGIN_SECONDS atrás, así que
+    # algunas filas pueden llegar dos veces pero ninguna escritura concurrente se pierde.
+    where = {} if completo else {"updatedAt": {"gt": desde}}
+    consultas = [
+        db.cliente.find_many(where=where),
+        db.producto.find_many(where=where),
+        db.asesor.find_many(where=where),
+    ]
+    if not completo:
+        consultas.append(db.registroeliminado.find_many(where={"deletedAt": {"gt": desde}}))
+    clientes, productos, asesores, *resto = await asyncio.gather(*consultas)
+    eliminados = resto[0] if resto else []
+
+    borrados = {entidad: [] for entidad in ENTIDADES}
+    for marca in eliminados:
+        borrados.setdefault(marca.entidad, []).append(marca.idRegistro)
+
+    return {
+        "token": encode_sync_token(ahora - timedelta(seconds=SYNC_MARGIN_SECONDS)),
+        "completo": completo,
+        "clientes": clientes,
+        "productos": productos,
+        "asesores": asesores,
+        "eliminados": borrados,
+    }
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
 
 # --- USUARIO ---
 class UserLogin(BaseModel):
@@ -22,10 +22,20 @@ class UserCreate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
 # --- EMPRESA ---
 class EmpresaBase(BaseModel):
     RazonSocial: str
@@ -87,12 +97,15 @@ class ClienteBase(BaseModel):
     createdBy: Optional[str] = None
     updatedBy: Optional[str] = None
 
-class Cliente(ClienteBase):
+class ClientePlano(ClienteBase):
+    # Sin relaciones anidadas: formato normalizado (el asesor va en "included")
     idCliente: str
-    asesor: Optional[Asesor] = None
     class Config:
         from_attributes = True
 
+class Cliente(ClientePlano):
+    asesor: Optional[Asesor] = None
+
 class ClienteCreate(ClienteBase):
     idCliente: str
     createdAt: datetime = Field(None, exclude=True)
@@ -107,6 +120,7 @@ class DetallePedidoBase(BaseModel):
     Cantidad: int
 
 class DetallePedidoCreate(DetallePedidoBase):
+    idPedido: str
     # Campos que el backend calcula o genera
     Total: float = Field(None, exclude=True)
     createdAt: datetime = Field(None, exclude=True)
@@ -114,12 +128,10 @@ class DetallePedidoCreate(DetallePedidoBase):
     createdBy: str = Field(None, exclude=True)
     updatedBy: str = Field(None, exclude=True)
 
-class DetallePedido(DetallePedidoBase):
+class DetallePedidoPlano(DetallePedidoBase):
     id: str
     idPedido: str
     Total: float
-    # Relación opcional para evitar recursión infinita
-    producto: Optional[Producto] = None
     createdAt: datetime
     updatedAt: datetime
     createdBy: str
@@ -128,7 +140,15 @@ class DetallePedido(DetallePedidoBase):
     class Config:
         from_attributes = True
 
+class DetallePedido(DetallePedidoPlano):
+    # Relación opcional para evitar recursión infinita
+    producto: Optional[Producto] = None
+
 # --- PEDIDO ---
+class DetallePedidoLinea(DetallePedidoBase):
+    # Id de una línea existente; en PUT /pedidos/{id} permite conservarla aunque cambie de producto
+    id: Optional[str] = None
+
 class PedidoBase(BaseModel):
     idPedido: str 
     idEmpresa: int
@@ -140,17 +160,14 @@ class PedidoBase(BaseModel):
 
 class PedidoCreate(PedidoBase):
     # CLAVE: Recibe la lista de detalles desde el frontend
-    detalles: List[DetallePedidoBase]
+    detalles: List[DetallePedidoLinea]
     createdAt: datetime = Field(None, exclude=True)
     updatedAt: datetime = Field(None, exclude=True)
     createdBy: str = Field(None, exclude=True)
     updatedBy: str = Field(None, exclude=True)
 
-class Pedido(PedidoBase):
-    asesor: Optional[Asesor] = None
-    cliente: Optional[Cliente] = None
-    # CLAVE: Devuelve la lista completa de detalles
-    detalles: List[DetallePedido] = []
+class PedidoPlano(PedidoBase):
+    detalles: List[DetallePedidoPlano] = []
     createdAt: datetime
     updatedAt: datetime
     createdBy: str
@@ -159,9 +176,102 @@ class Pedido(PedidoBase):
     class Config:
         from_attributes = True
 
+class Pedido(PedidoPlano):
+    asesor: Optional[Asesor] = None
+    cliente: Optional[Cliente] = None
+    # CLAVE: Devuelve la lista completa de detalles
+    detalles: List[DetallePedido] = []
+
+# --- FORMATO NORMALIZADO (?formato=normalizado) ---
+# Cada asesor, cliente y producto aparece una sola vez en "included", indexado por id;
+# los registros de "data" lo referencian por idAsesor / idCliente / idProducto.
+class Incluidos(BaseModel):
+    asesores: Dict[str, Asesor] = {}
+    clientes: Dict[str, ClientePlano] = {}
+    productos: Dict[str, Producto] = {}
+
+class PedidosNormalizados(BaseModel):
+    data: List[PedidoPlano]
+    included: Incluidos
+
+class ClientesNormalizados(BaseModel):
+    data: List[ClientePlano]
+    included: Incluidos
+
+
+class PedidoPatch(BaseModel):
+    # Solo se actualizan los campos enviados; los detalles se editan con PUT o /detalle_pedidos
+    fechaPedido: Optional[datetime] = None
+    totalPedido: Optional[float] = None
+    Status: Optional[str] = None
+    idAsesor: Optional[str] = None
+    idCliente: Optional[str] = None
+    idEmpresa: Optional[int] = None
+    # Concurrencia optimista: si se envía y el pedido cambió desde entonces, responde 409
+    updatedAt: Optional[datetime] = None
+
+class PedidoStatusMasivo(BaseModel):
+    Status: str
+    # Pedidos a cambiar: por lista de ids y/o por filtro (al menos uno de los dos)
+    idPedidos: Optional[List[str]] = None
+    statusActual: Optional[str] = None
+    idAsesor: Optional[str] = None
+    idCliente: Optional[str] = None
+    idEmpresa: Optional[int] = None
+    fechaDesde: Optional[datetime] = None
+    fechaHasta: Optional[datetime] = None
+
+class PedidoStatusMasivoRespuesta(BaseModel):
+    actualizados: int
+    idPedidos: List[str]
+
+class PedidoBulkResultado(BaseModel):
+    idPedido: str
+    estado: Literal["created", "duplicate", "error"]
+    detalle: Optional[str] = None
+
+class PedidoBulkRespuesta(BaseModel):
+    creados: int
+    duplicados: int
+    errores: int
+    resultados: List[PedidoBulkResultado]
+
+
+# --- SYNC (Sincronización incremental de catálogos) ---
+class SyncEliminados(BaseModel):
+    clientes: List[str] = []
+    productos: List[str] = []
+    asesores: List[str] = []
+
+class SyncRespuesta(BaseModel):
+    token: str
+    # True cuando se envía todo (primer sync o token vencido): el cliente reemplaza sus datos
+    completo: bool
+    clientes: List[Cliente]
+    productos: List[Producto]
+    asesores: List[Asesor]
+    eliminados: SyncEliminados
+
+
+# --- REPORTES (Ventas agregadas desde los resúmenes diarios) ---
+class ReporteVentasFila(BaseModel):
+    periodo: date  # primer día del día/semana/mes
+    clave: str     # idAsesor, Zona, idCliente o idProducto según la agrupación
+    nombre: Optional[str] = None
+    pedidos: int
+    cantidad: int
+    total: float
+
 
 class EmpresaUpdatePedidos(BaseModel):
     idPedido: int
+
+class NumeracionReservada(BaseModel):
+    idEmpresa: int
+    serie: Literal["pedido", "recibo"]
+    desde: int
+    hasta: int
+    cantidad: int
     
 # --- RECONSTRUCCIÓN PARA REFERENCIAS CRUZADAS ---
 # Esto permite que Pedido reconozca a DetallePedido aunque estén en el mismo archivo
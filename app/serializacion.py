@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Union, get_args, get_origin
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+# Respuesta por defecto de la app (main.py): orjson en lugar de json.dumps
+RespuestaJSON = ORJSONResponse
+
+
+def _modelo_de(anotacion) -> tuple[Optional[type[BaseModel]], bool]:
+    """Devuelve (modelo pydantic anidado, es_lista) para List[X], Optional[X] o X."""
+    origen = get_origin(anotacion)
+    if origen in (list, List):
+        modelo, _ = _modelo_de(get_args(anotacion)[0])
+        return modelo, True
+    if origen is Union:
+        for arg in get_args(anotacion):
+            if arg is not type(None):
+                return _modelo_de(arg)
+    if isinstance(anotacion, type) and issubclass(anotacion, BaseModel):
+        return anotacion, False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def campos(esquema: type[BaseModel]) -> dict:
+    """Árbol `include` con los campos que publica el esquema de respuesta (recursivo)."""
+    arbol = {}
+    for nombre, campo in esquema.model_fields.items():
+        if campo.exclude:
+            continue
+        modelo, es_lista = _modelo_de(campo.annotation)
+        if modelo is None:
+            arbol[nombre] = True
+        else:
+            arbol[nombre] = {"__all__": campos(modelo)} if es_lista else campos(modelo)
+    return arbol
+
+
+@lru_cache(maxsize=None)
+def adaptador(esquema: type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter de un esquema de respuesta, compilado una sola vez por esquema."""
+    return TypeAdapter(esquema)
+
+
+@lru_cache(maxsize=None)
+def _adaptador(tipo: type) -> TypeAdapter:
+    # Un TypeAdapter por modelo de Prisma; compilar el serializador es lo caro y se hace una vez
+    return TypeAdapter(List[tipo])
+
+
+@lru_cache(maxsize=None)
+def _adaptador_dict(tipo: type) -> TypeAdapter:
+    return TypeAdapter(Dict[str, tipo])
+
+
+def _cabeceras(response: Optional[Response]) -> Optional[dict]:
+    if response is None:
+        return None
+    return {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+
+
+def lista_json(esquema: type[BaseModel], filas: list, response: Optional[Response] = None) -> Response:
+    """Serializa filas que vienen de la base con la forma de `esquema`, sin revalidarlas.
+
+    Equivale a devolver la lista con response_model=List[esquema], pero sin el paso de
+    validación + jsonable_encoder: el serializador de pydantic recorre los modelos de
+    Prisma directamente, limitado a los campos del esquema. Solo para datos confiables
+    (resultados de Prisma con los mismos includes que pide el esquema). Las cabeceras ya
+    puestas en `response` (cursor, ETag) se copian a la respuesta.
+    """
+    if filas:
+        contenido = _adaptador(type(filas[0])).dump_json(filas, include={"__all__": campos(esquema)})
+    else:
+        contenido = b"[]"
+    return Response(content=contenido, media_type="application/json", headers=_cabeceras(response))
+
+
+def normalizado_json(
+    esquema: type[BaseModel],
+    filas: list,
+    incluidos: dict[str, tuple[type[BaseModel], dict]],
+    response: Optional[Response] = None,
+) -> Response:
+    """Arma {"data": [...], "included": {nombre: {id: {...}}}} con las mismas reglas que lista_json.
+
+    `incluidos` es {nombre: (esquema, {id: fila de Prisma})}; cada relación sale una sola vez.
+    """
+    partes = [b'{"data":', lista_json(esquema, filas).body, b',"included":{']
+    for i, (nombre, (esquema_incluido, por_id)) in enumerate(incluidos.items()):
+        if por_id:
+            tipo = type(next(iter(por_id.values())))
+            valores = _adaptador_dict(tipo).dump_json(por_id, include={"__all__": campos(esquema_incluido)})
+        else:
+            valores = b"{}"
+        partes += [b"," if i else b"", orjson.dumps(nombre), b":", valores]
+    partes.append(b"}}")
+    return Response(content=b"".join(partes), media_type="application/json", headers=_cabeceras(response))
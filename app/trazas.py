@@ -0,0 +1,171 @@
+"""Traza de consultas Prisma por petición: detección de N+1 y log de consultas lentas.
+
+Cada consulta que pasa por el hook de app/metricas.py se anota con modelo, acción,
+duración, forma (la consulta sin valores) y el punto del código que la originó. Al
+terminar la petición:
+
+- si hubo más de QUERY_TRACE_MAX consultas, o la misma forma se repitió
+  QUERY_TRACE_REPETIDAS veces o más, se registra una advertencia "posible N+1" en el
+  logger saporive.n_mas_uno con el detalle agrupado por forma y origen;
+- cada consulta que superó SLOW_QUERY_MS se registra en saporive.consultas_lentas (JSON
+  por línea). Para SQL crudo (query_raw / execute_raw) se adjunta EXPLAIN (FORMAT JSON);
+  el SQL de las consultas de modelo lo arma el motor de Prisma y no es visible desde
+  Python, así que para esas se registra la forma de la consulta (activar auto_explain
+  en Postgres para ver su plan).
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter as Conteo
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from app.metricas import agregar_observador
+
+log_n_mas_uno = logging.getLogger("saporive.n_mas_uno")
+log_lentas = logging.getLogger("saporive.consultas_lentas")
+
+QUERY_TRACE = os.getenv("QUERY_TRACE", "1") == "1"
+QUERY_TRACE_MAX = int(os.getenv("QUERY_TRACE_MAX", "15"))
+QUERY_TRACE_REPETIDAS = int(os.getenv("QUERY_TRACE_REPETIDAS", "3"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# Un mismo SQL lento se explica como mucho una vez en este intervalo (por worker)
+SLOW_QUERY_EXPLAIN_SECONDS = 300
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROPIOS = (os.path.abspath(__file__), os.path.join(_RAIZ, "app", "metricas.py"))
+
+
+class Consulta(NamedTuple):
+    modelo: Optional[str]
+    accion: str
+    forma: str
+    origen: str
+    duracion_ms: float
+
+
+_traza: ContextVar[Optional[list]] = ContextVar("traza_consultas", default=None)
+_explicando: ContextVar[bool] = ContextVar("explicando", default=False)
+_explicados: dict[str, float] = {}
+_cliente = None
+
+
+def _forma_valor(valor):
+    # Estructura sin datos: dos consultas con la misma forma difieren solo en los valores
+    if isinstance(valor, dict):
+        return {k: _forma_valor(v) for k, v in sorted(valor.items())}
+    if isinstance(valor, (list, tuple)):
+        return [_forma_valor(valor[0])] if valor else []
+    return "?"
+
+
+def forma(method: str, model, arguments: dict) -> str:
+    if method in ("query_raw", "execute_raw"):
+        return " ".join(arguments.get("query", "").split())
+    nombre = getattr(model, "__name__", None) or "-"
+    return f"{nombre}.{method} {json.dumps(_forma_valor(arguments), separators=(',', ':'))}"
+
+
+def origen() -> str:
+    """Primer marco de la pila que pertenece al código de la API (no a Prisma ni a este hook)."""
+    marco = sys._getframe(1)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if archivo.startswith(_RAIZ) and archivo not in _PROPIOS and "site-packages" not in archivo:
+            return f"{os.path.relpath(archivo, _RAIZ)}:{marco.f_lineno} {marco.f_code.co_name}"
+        marco = marco.f_back
+    return "?"
+
+
+def _observar(cliente, method, arguments, model, duracion):
+    if _explicando.get():
+        return
+    traza = _traza.get()
+    lenta = duracion * 1000 >= SLOW_QUERY_MS
+    if traza is None and not lenta:
+        return
+    consulta = Consulta(
+        modelo=getattr(model, "__name__", None),
+        accion=method,
+        forma=forma(method, model, arguments),
+        origen=origen(),
+        duracion_ms=round(duracion * 1000, 2),
+    )
+    if traza is not None:
+        traza.append(consulta)
+    if lenta:
+        _registrar_lenta(consulta, arguments)
+
+
+def _registrar_lenta(consulta: Consulta, arguments: dict):
+    registro = {"evento": "consulta_lenta", **consulta._asdict()}
+    sql = arguments.get("query") if consulta.accion in ("query_raw", "execute_raw") else None
+    ahora = time.monotonic()
+    if sql and _cliente is not None and ahora - _explicados.get(consulta.forma, -SLOW_QUERY_EXPLAIN_SECONDS) >= SLOW_QUERY_EXPLAIN_SECONDS:
+        _explicados[consulta.forma] = ahora
+        # El EXPLAIN no bloquea la petición: se registra cuando vuelve
+        asyncio.get_running_loop().create_task(_explicar(registro, sql, arguments.get("parameters")))
+        return
+    log_lentas.warning(json.dumps(registro, ensure_ascii=False))
+
+
+async def _explicar(registro: dict, sql: str, parametros):
+    _explicando.set(True)  # la tarea tiene su propio contexto: no afecta a la petición
+    try:
+        params = json.loads(parametros) if isinstance(parametros, str) else (parametros or [])
+        # EXPLAIN sin ANALYZE: planifica sin ejecutar, seguro también para UPDATE/INSERT
+        filas = await _cliente.query_raw(f"EXPLAIN (FORMAT JSON) {sql}", *params)
+        registro["explain"] = filas[0].get("QUERY PLAN") if filas else None
+    except Exception as e:
+        registro["explain_error"] = str(e)
+    log_lentas.warning(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def _revisar(metodo: str, ruta: str, traza: list):
+    repetidas = Conteo(c.forma for c in traza)
+    sospechosas = {f: n for f, n in repetidas.items() if n >= QUERY_TRACE_REPETIDAS}
+    if len(traza) <= QUERY_TRACE_MAX and not sospechosas:
+        return
+    log_n_mas_uno.warning(json.dumps({
+        "evento": "posible_n_mas_uno",
+        "ruta": f"{metodo} {ruta}",
+        "consultas": len(traza),
+        "ms_db": round(sum(c.duracion_ms for c in traza), 2),
+        "repetidas": [
+            {
+                "forma": f,
+                "veces": n,
+                "origenes": sorted({c.origen for c in traza if c.forma == f}),
+            }
+            for f, n in sorted(sospechosas.items(), key=lambda x: -x[1])
+        ],
+        "por_origen": dict(Conteo(c.origen for c in traza).most_common(10)),
+    }, ensure_ascii=False))
+
+
+def instalar_trazas(cliente):
+    """Registra el observador sobre el hook de Prisma; `cliente` se usa para los EXPLAIN."""
+    global _cliente
+    _cliente = cliente
+    agregar_observador(_observar)
+
+
+class TrazasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_TRACE:
+            await self.app(scope, receive, send)
+            return
+        traza: list[Consulta] = []
+        token = _traza.set(traza)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _traza.reset(token)
+            if traza:
+                _revisar(scope["method"], getattr(scope.get("route"), "path", scope["path"]), traza)
@@ -0,0 +1,131 @@
+"""Compara el volumen de escritura de update_pedido: reemplazo total vs. diferencia.
+
+Crea un pedido temporal con N líneas (usa el primer asesor, cliente y productos de la
+base) y aplica la misma secuencia de ediciones con cada estrategia:
+
+  reemplazo   borra todas las líneas y las vuelve a insertar (comportamiento anterior)
+  diferencia  aplicar_detalles() de app/routes/pedidos.py (solo nuevas, cambiadas, borradas)
+
+Mide los bytes de WAL con pg_current_wal_lsn() antes y después de cada fase. La medida
+es de todo el servidor: correrlo en una base de desarrollo sin otro tráfico.
+
+    python benchDetalles.py --lineas 30 --ediciones 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+from app import schemas  # noqa: E402
+from app.routes.pedidos import aplicar_detalles  # noqa: E402
+
+USUARIO = 'bench-detalles'
+
+
+async def lsn(db: Prisma) -> str:
+    return (await db.query_raw('SELECT pg_current_wal_lsn()::text AS lsn'))[0]['lsn']
+
+
+async def bytes_wal(db: Prisma, desde: str) -> int:
+    return int((await db.query_raw(
+        'SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), $1::pg_lsn)::bigint AS bytes', desde
+    ))[0]['bytes'])
+
+
+def ediciones(productos: list, lineas: int, cantidad: int, semilla: int) -> list[list[schemas.DetallePedidoLinea]]:
+    """Secuencia típica de un asesor: casi siempre cambia una cantidad, a veces agrega o quita un producto."""
+    rng = random.Random(semilla)
+    actual = [schemas.DetallePedidoLinea(idProducto=p.idProducto, Precio=p.Precio, Cantidad=1) for p in productos[:lineas]]
+    secuencia = []
+    for _ in range(cantidad):
+        actual = [d.model_copy() for d in actual]
+        r = rng.random()
+        if r < 0.8 or len(actual) < 2:
+            i = rng.randrange(len(actual))
+            actual[i].Cantidad += 1
+        elif r < 0.9:
+            p = rng.choice(productos)
+            actual.append(schemas.DetallePedidoLinea(idProducto=p.idProducto, Precio=p.Precio, Cantidad=1))
+        else:
+            actual.pop(rng.randrange(len(actual)))
+        secuencia.append(actual)
+    return secuencia
+
+
+async def reemplazo(tx: Prisma, id_pedido: str, existentes, nuevos) -> int:
+    await tx.detallepedido.delete_many(where={'idPedido': id_pedido})
+    await tx.detallepedido.create_many(data=[
+        {'idPedido': id_pedido, 'idProducto': d.idProducto, 'Precio': d.Precio, 'Cantidad': d.Cantidad,
+         'Total': d.Precio * d.Cantidad, 'createdBy': USUARIO, 'updatedBy': USUARIO}
+        for d in nuevos
+    ])
+    return len(existentes) + len(nuevos)
+
+
+async def diferencia(tx: Prisma, id_pedido: str, existentes, nuevos) -> int:
+    return await aplicar_detalles(tx, id_pedido, existentes, nuevos, USUARIO)
+
+
+async def fase(db: Prisma, estrategia, id_pedido: str, secuencia) -> dict:
+    await db.detallepedido.delete_many(where={'idPedido': id_pedido})
+    inicio_lsn = await lsn(db)
+    inicio = time.perf_counter()
+    filas = 0
+    for nuevos in secuencia:
+        async with db.tx() as tx:
+            existentes = await tx.detallepedido.find_many(where={'idPedido': id_pedido})
+            filas += await estrategia(tx, id_pedido, existentes, nuevos)
+            await tx.pedido.update(where={'idPedido': id_pedido}, data={'updatedBy': USUARIO})
+    return {'segundos': time.perf_counter() - inicio, 'filas': filas, 'wal': await bytes_wal(db, inicio_lsn)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', type=int, default=30, help='Líneas iniciales del pedido')
+    parser.add_argument('--ediciones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    db = Prisma()
+    await db.connect()
+    id_pedido = f'bench-detalles-{int(time.time())}'
+    try:
+        asesor = await db.asesor.find_first()
+        cliente = await db.cliente.find_first(where={'idAsesor': asesor.idAsesor}) if asesor else None
+        productos = await db.producto.find_many(take=args.lineas * 2, order={'idProducto': 'asc'})
+        if not cliente or len(productos) < args.lineas:
+            raise SystemExit('Hace falta al menos un asesor con cliente y --lineas productos en la base')
+
+        empresa = await db.empresa.find_first()
+        await db.pedido.create(data={
+            'idPedido': id_pedido, 'idEmpresa': empresa.idEmpresa if empresa else 1,
+            'fechaPedido': datetime.now(timezone.utc), 'totalPedido': 0, 'Status': 'Bench',
+            'idAsesor': asesor.idAsesor, 'idCliente': cliente.idCliente,
+            'createdBy': USUARIO, 'updatedBy': USUARIO,
+        })
+        secuencia = ediciones(productos, args.lineas, args.ediciones, args.semilla)
+        resultados = {
+            'reemplazo': await fase(db, reemplazo, id_pedido, secuencia),
+            'diferencia': await fase(db, diferencia, id_pedido, secuencia),
+        }
+    finally:
+        await db.pedido.delete_many(where={'idPedido': id_pedido})
+        await db.disconnect()
+
+    print(f"{args.ediciones} ediciones sobre un pedido de {args.lineas} líneas")
+    print(f"{'estrategia':<12}{'filas':>9}{'WAL KiB':>11}{'KiB/edición':>13}{'seg':>8}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<12}{r['filas']:>9}{r['wal'] / 1024:>11.1f}{r['wal'] / 1024 / args.ediciones:>13.2f}{r['segundos']:>8.2f}")
+    base, nuevo = resultados['reemplazo']['wal'], resultados['diferencia']['wal']
+    if base:
+        print(f"WAL con diferencia: {nuevo / base:.0%} del reemplazo total")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""Mide el efecto de una ráfaga de logins sobre la latencia de un endpoint ajeno.
+
+Con la API corriendo (./devserver.sh o gunicorn), mide p50/p95/p99 de GET /productos/
+primero en reposo y luego mientras N clientes golpean POST /token en paralelo.
+Comparar la salida antes y después de un cambio muestra cuánto frena el hashing al
+resto de las peticiones del worker.
+
+    python benchLogin.py --url http://localhost:8000 --usuario demo --clave secreto
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentiles(muestras: list[float]) -> dict:
+    ordenadas = sorted(muestras)
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+    return {'n': len(ordenadas), 'p50': p(0.50), 'p95': p(0.95), 'p99': p(0.99), 'media': statistics.mean(ordenadas) * 1000}
+
+
+async def login(client: httpx.AsyncClient, usuario: str, clave: str) -> httpx.Response:
+    return await client.post('/token', data={'username': usuario, 'password': clave})
+
+
+async def medir_lecturas(client: httpx.AsyncClient, token: str, duracion: float) -> list[float]:
+    muestras = []
+    fin = time.perf_counter() + duracion
+    headers = {'Authorization': f'Bearer {token}'}
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        r = await client.get('/productos/', headers=headers)
+        r.raise_for_status()
+        muestras.append(time.perf_counter() - inicio)
+    return muestras
+
+
+async def tormenta(client: httpx.AsyncClient, usuario: str, clave: str, concurrencia: int, duracion: float) -> dict:
+    codigos: dict[int, int] = {}
+    fin = time.perf_counter() + duracion
+
+    async def bucle():
+        while time.perf_counter() < fin:
+            r = await login(client, usuario, clave)
+            codigos[r.status_code] = codigos.get(r.status_code, 0) + 1
+
+    await asyncio.gather(*(bucle() for _ in range(concurrencia)))
+    return codigos
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--usuario', required=True)
+    parser.add_argument('--clave', required=True)
+    parser.add_argument('--concurrencia', type=int, default=50, help='Logins simultáneos durante la ráfaga')
+    parser.add_argument('--duracion', type=float, default=15.0, help='Segundos de cada fase')
+    args = parser.parse_args()
+
+    limites = httpx.Limits(max_connections=args.concurrencia + 10)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=60) as client:
+        r = await login(client, args.usuario, args.clave)
+        r.raise_for_status()
+        token = r.json()['access_token']
+
+        reposo = percentiles(await medir_lecturas(client, token, args.duracion))
+        lecturas, codigos = await asyncio.gather(
+            medir_lecturas(client, token, args.duracion),
+            tormenta(client, args.usuario, args.clave, args.concurrencia, args.duracion),
+        )
+        carga = percentiles(lecturas)
+
+    print(f"Logins durante la ráfaga por código HTTP: {codigos}")
+    print(f"{'fase':<10}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for nombre, m in (('reposo', reposo), ('ráfaga', carga)):
+        print(f"{nombre:<10}{m['n']:>8}{m['p50']:>10.1f}{m['p95']:>10.1f}{m['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
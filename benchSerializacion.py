@@ -0,0 +1,109 @@
+"""Microbenchmark del costo de serializar GET /pedidos/ (por cada 1000 pedidos).
+
+Lee pedidos reales con los mismos includes que el endpoint (si hay menos que --pedidos,
+los repite) y mide tres caminos sobre la misma lista:
+
+  fastapi     lo que hacía la app: validar contra List[schemas.Pedido] + json.dumps (JSONResponse)
+  orjson      misma validación, render con orjson (default_response_class de main.py)
+  lista_json  app.serializacion.lista_json: sin revalidar, TypeAdapter precompilado
+
+    python benchSerializacion.py --pedidos 1000 --repeticiones 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import orjson
+from dotenv import load_dotenv
+from prisma import Prisma
+from pydantic import TypeAdapter
+
+load_dotenv()
+
+from app import schemas  # noqa: E402
+from app.serializacion import lista_json  # noqa: E402
+
+ADAPTADOR = TypeAdapter(List[schemas.Pedido])
+
+
+def validar(pedidos):
+    # Lo que hace FastAPI con response_model: validar desde atributos y pasar a tipos JSON
+    return ADAPTADOR.dump_python(ADAPTADOR.validate_python(pedidos, from_attributes=True), mode='json')
+
+
+def camino_fastapi(pedidos) -> bytes:
+    return json.dumps(validar(pedidos), ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+
+
+def camino_orjson(pedidos) -> bytes:
+    return orjson.dumps(validar(pedidos), option=orjson.OPT_NON_STR_KEYS)
+
+
+def camino_lista_json(pedidos) -> bytes:
+    return lista_json(schemas.Pedido, pedidos).body
+
+
+def medir(funcion, pedidos, repeticiones: int) -> dict:
+    funcion(pedidos)  # calentamiento (compila serializadores)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cuerpo = funcion(pedidos)
+        tiempos.append(time.perf_counter() - inicio)
+    por_mil = 1000 / len(pedidos)
+    return {
+        'mediana': statistics.median(tiempos) * 1000 * por_mil,
+        'p95': sorted(tiempos)[int(0.95 * (len(tiempos) - 1))] * 1000 * por_mil,
+        'bytes': len(cuerpo),
+        'cuerpo': cuerpo,
+    }
+
+
+async def cargar(n: int):
+    db = Prisma()
+    await db.connect()
+    try:
+        return await db.pedido.find_many(
+            include={'detalles': True, 'asesor': True, 'cliente': True},
+            order={'createdAt': 'desc'},
+            take=n
+        )
+    finally:
+        await db.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=1000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    pedidos = asyncio.run(cargar(args.pedidos))
+    if not pedidos:
+        raise SystemExit('No hay pedidos en la base (generar datos de prueba primero)')
+    pedidos = (pedidos * (args.pedidos // len(pedidos) + 1))[:args.pedidos]
+    lineas = sum(len(p.detalles or []) for p in pedidos)
+    print(f"{len(pedidos)} pedidos, {lineas} líneas de detalle, {args.repeticiones} repeticiones")
+
+    resultados = {
+        'fastapi': medir(camino_fastapi, pedidos, args.repeticiones),
+        'orjson': medir(camino_orjson, pedidos, args.repeticiones),
+        'lista_json': medir(camino_lista_json, pedidos, args.repeticiones),
+    }
+    # Mismo contenido en los tres caminos (el orden de las claves puede variar)
+    referencia = json.loads(resultados['fastapi']['cuerpo'])
+    for nombre, r in resultados.items():
+        if json.loads(r['cuerpo']) != referencia:
+            raise SystemExit(f"{nombre}: la salida difiere de la de FastAPI")
+
+    base = resultados['fastapi']['mediana']
+    print(f"{'camino':<12}{'ms/1k med':>11}{'ms/1k p95':>11}{'KiB':>9}{'vs fastapi':>12}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<12}{r['mediana']:>11.2f}{r['p95']:>11.2f}{r['bytes'] / 1024:>9.0f}{base / r['mediana']:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
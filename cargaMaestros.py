@@ -0,0 +1,272 @@
+"""Carga masiva de datos maestros (asesores, productos, clientes) desde los CSV.
+
+Lee cada CSV por bloques, limpia y deduplica con pandas, y escribe con INSERT multi-fila
++ ON CONFLICT DO UPDATE (solo toca filas que realmente cambiaron). Carga en orden de
+dependencias: asesores y productos en paralelo, luego clientes.
+
+    python cargaMaestros.py                      # todo
+    python cargaMaestros.py clientes             # una entidad (y nada más)
+    python cargaMaestros.py --solo-cambios       # compara con la base y envía solo nuevos/cambiados
+    python cargaMaestros.py --simular            # muestra el diff sin escribir
+"""
+import argparse
+import asyncio
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+# Configuración por entidad: columnas del CSV -> columnas de la tabla
+ENTIDADES = {
+    'asesores': {
+        'archivo': 'asesores.csv',
+        'tabla': 'Asesor',
+        'renombrar': {'idAsesor': 'idAsesor', 'asesor': 'Asesor'},
+        'clave': 'idAsesor',
+        'unicos': ['idAsesor'],
+        'actualizar': ['Asesor'],
+        'depende': [],
+    },
+    'productos': {
+        'archivo': 'productos.csv',
+        'tabla': 'Producto',
+        'renombrar': {'idProducto': 'idProducto', 'producto': 'Producto', 'precio': 'Precio'},
+        'clave': 'idProducto',
+        'unicos': ['idProducto'],
+        'actualizar': ['Producto', 'Precio'],
+        'depende': [],
+    },
+    'clientes': {
+        'archivo': 'Clientes.csv',
+        'tabla': 'Cliente',
+        'renombrar': {'idCliente': 'idCliente', 'rif': 'Rif', 'cliente': 'Cliente', 'zona': 'Zona', 'idAsesor': 'idAsesor'},
+        'clave': 'Rif',
+        'unicos': ['Rif', 'idCliente'],
+        'actualizar': ['Cliente', 'Zona', 'idAsesor'],
+        'depende': ['asesores'],
+    },
+}
+
+CHUNK_CSV = 5000
+FILAS_POR_LOTE = 1000
+ESCRITURAS_CONCURRENTES = 4
+
+
+def limpiar(nombre: str, df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """Limpieza vectorizada; devuelve (filas válidas, cantidad de rechazadas)."""
+    conf = ENTIDADES[nombre]
+    df = df[list(conf['renombrar'])].rename(columns=conf['renombrar'])
+    for col in df.columns:
+        df[col] = df[col].str.strip()
+
+    if nombre == 'clientes':
+        df['Zona'] = df['Zona'].fillna('SIN ZONA').replace('', 'SIN ZONA')
+    if nombre == 'productos':
+        df['Precio'] = pd.to_numeric(df['Precio'].str.replace(',', '.', regex=False), errors='coerce')
+
+    validas = df.notna().all(axis=1) & df[conf['clave']].ne('')
+    return df[validas], int((~validas).sum())
+
+
+def diferencia(nombre: str, df: pd.DataFrame, existentes: pd.DataFrame) -> tuple[pd.DataFrame, int, int, int]:
+    """Compara con lo que hay en la base; devuelve (nuevos + cambiados, nuevos, cambiados, sin cambios)."""
+    conf = ENTIDADES[nombre]
+    clave, cols = conf['clave'], conf['actualizar']
+    m = df.merge(existentes, on=clave, how='left', suffixes=('', '_db'), indicator=True)
+    nuevos = (m['_merge'] == 'left_only').to_numpy()
+    cambiados = ~nuevos & m[cols].ne(m[[f'{c}_db' for c in cols]].to_numpy()).any(axis=1).to_numpy()
+    enviar = df[nuevos | cambiados]
+    return enviar, int(nuevos.sum()), int(cambiados.sum()), int((~nuevos & ~cambiados).sum())
+
+
+def sql_upsert(nombre: str, columnas: list[str], filas: int) -> str:
+    conf = ENTIDADES[nombre]
+    tabla, n = conf['tabla'], len(columnas)
+    # $1 es el usuario; los valores de las filas empiezan en $2
+    valores = ', '.join(
+        '(' + ', '.join(f'${2 + i * n + j}' for j in range(n)) + ', $1, $1, now())'
+        for i in range(filas)
+    )
+    lista = ', '.join(f'"{c}"' for c in columnas)
+    asignar = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in conf['actualizar'])
+    actuales = ', '.join(f'"{tabla}"."{c}"' for c in conf['actualizar'])
+    nuevos = ', '.join(f'EXCLUDED."{c}"' for c in conf['actualizar'])
+    return (
+        f'INSERT INTO "{tabla}" ({lista}, "createdBy", "updatedBy", "updatedAt") VALUES {valores} '
+        f'ON CONFLICT ("{conf["clave"]}") DO UPDATE SET {asignar}, '
+        f'"updatedBy" = EXCLUDED."updatedBy", "updatedAt" = now() '
+        f'WHERE ({actuales}) IS DISTINCT FROM ({nuevos})'
+    )
+
+
+async def escribir(db: Prisma, nombre: str, df: pd.DataFrame, usuario: str, lote: int,
+                   semaforo: asyncio.Semaphore) -> tuple[int, int]:
+    """Escribe por lotes; devuelve (filas escritas, filas de lotes fallidos)."""
+    columnas = list(df.columns)
+
+    async def un_lote(parte: pd.DataFrame) -> int:
+        params = [usuario]
+        for fila in parte.itertuples(index=False, name=None):
+            params.extend(fila)
+        async with semaforo:
+            return await db.execute_raw(sql_upsert(nombre, columnas, len(parte)), *params)
+
+    partes = [df.iloc[i:i + lote] for i in range(0, len(df), lote)]
+    # Un lote que falla no detiene a los demás: se informa y se sigue
+    resultados = await asyncio.gather(*(un_lote(p) for p in partes), return_exceptions=True)
+    escritos = fallidos = 0
+    for parte, resultado in zip(partes, resultados):
+        if isinstance(resultado, BaseException):
+            fallidos += len(parte)
+            print(f"  {nombre}: falló un lote de {len(parte)} filas ({parte.iloc[0][ENTIDADES[nombre]['clave']]} ...): {resultado}")
+        else:
+            escritos += resultado
+    return escritos, fallidos
+
+
+async def leer_existentes(db: Prisma, nombre: str) -> pd.DataFrame:
+    conf = ENTIDADES[nombre]
+    cols = [conf['clave'], *conf['actualizar']]
+    lista = ', '.join(f'"{c}"' for c in cols)
+    filas = await db.query_raw(f'SELECT {lista} FROM "{conf["tabla"]}"')
+    return pd.DataFrame(filas, columns=cols)
+
+
+async def leer_duenos(db: Prisma, nombre: str) -> dict[str, dict[str, str]]:
+    """Para cada columna única distinta de la clave: {valor en la base: clave de la fila que lo tiene}."""
+    conf = ENTIDADES[nombre]
+    clave = conf['clave']
+    duenos = {}
+    for col in conf['unicos']:
+        if col != clave:
+            filas = await db.query_raw(f'SELECT "{col}", "{clave}" FROM "{conf["tabla"]}"')
+            duenos[col] = {f[col]: f[clave] for f in filas}
+    return duenos
+
+
+async def cargar_entidad(db: Prisma, nombre: str, args, contexto: dict) -> dict:
+    conf = ENTIDADES[nombre]
+    inicio = time.perf_counter()
+    informe = {'entidad': nombre, 'leidos': 0, 'rechazados': 0, 'duplicados': 0,
+               'nuevos': None, 'cambiados': None, 'sin_cambios': None, 'escritos': 0, 'fallidos': 0}
+
+    comparar = args.solo_cambios or args.simular
+    existentes = await leer_existentes(db, nombre) if comparar else None
+    # El upsert resuelve conflictos solo por la clave: una fila cuyo otro único (p. ej. idCliente)
+    # ya pertenece a otra clave en la base violaría ese índice y tumbaría todo su lote
+    duenos = await leer_duenos(db, nombre)
+    asesores_validos = None
+    if nombre == 'clientes':
+        asesores_validos = {f['idAsesor'] for f in await db.query_raw('SELECT "idAsesor" FROM "Asesor"')}
+        asesores_validos |= contexto.get('asesores', set())  # en simulación aún no están en la base
+
+    vistos = {col: set() for col in conf['unicos']}
+    semaforo = asyncio.Semaphore(ESCRITURAS_CONCURRENTES)
+    for chunk in pd.read_csv(conf['archivo'], chunksize=args.chunk, dtype=str):
+        informe['leidos'] += len(chunk)
+        df, rechazados = limpiar(nombre, chunk)
+        informe['rechazados'] += rechazados
+
+        # Deduplicación dentro del bloque y contra bloques anteriores (se queda la primera)
+        antes = len(df)
+        for col in conf['unicos']:
+            df = df.drop_duplicates(subset=[col])
+            df = df[~df[col].isin(vistos[col])]
+        for col in conf['unicos']:
+            vistos[col].update(df[col])
+        informe['duplicados'] += antes - len(df)
+
+        for col, por_valor in duenos.items():
+            dueno = df[col].map(por_valor)
+            ajeno = dueno.notna() & dueno.ne(df[conf['clave']])
+            informe['rechazados'] += int(ajeno.sum())
+            df = df[~ajeno]
+
+        if asesores_validos is not None:
+            sin_asesor = ~df['idAsesor'].isin(asesores_validos)
+            informe['rechazados'] += int(sin_asesor.sum())
+            df = df[~sin_asesor]
+
+        if comparar:
+            df, nuevos, cambiados, iguales = diferencia(nombre, df, existentes)
+            informe['nuevos'] = (informe['nuevos'] or 0) + nuevos
+            informe['cambiados'] = (informe['cambiados'] or 0) + cambiados
+            informe['sin_cambios'] = (informe['sin_cambios'] or 0) + iguales
+
+        if not args.simular and len(df):
+            escritos, fallidos = await escribir(db, nombre, df, args.usuario, args.lote, semaforo)
+            informe['escritos'] += escritos
+            informe['fallidos'] += fallidos
+
+    contexto[nombre] = vistos[conf['clave']]
+    informe['segundos'] = time.perf_counter() - inicio
+    return informe
+
+
+def invalidar_caches(nombres: list[str]):
+    # Avisa a los workers de la API que recarguen sus catálogos
+    from app.cache import asesores_cache, productos_cache
+    if 'asesores' in nombres:
+        asesores_cache.invalidate()
+    if 'productos' in nombres:
+        productos_cache.invalidate()
+
+
+def imprimir_informe(informes: list[dict]):
+    def v(x):
+        return '-' if x is None else x
+    print(f"\n{'entidad':<11}{'leídos':>8}{'rechaz.':>9}{'dupl.':>7}{'nuevos':>8}{'cambios':>9}{'iguales':>9}{'escritos':>10}{'fallos':>8}{'seg':>8}{'filas/s':>10}")
+    for i in informes:
+        tasa = i['leidos'] / i['segundos'] if i['segundos'] else 0
+        print(f"{i['entidad']:<11}{i['leidos']:>8}{i['rechazados']:>9}{i['duplicados']:>7}{v(i['nuevos']):>8}"
+              f"{v(i['cambiados']):>9}{v(i['sin_cambios']):>9}{i['escritos']:>10}{i['fallidos']:>8}{i['segundos']:>8.2f}{tasa:>10.0f}")
+
+
+async def cargar(entidades: list[str] | None = None, args=None):
+    if args is None:
+        args = argparse.Namespace(simular=False, solo_cambios=False, chunk=CHUNK_CSV, lote=FILAS_POR_LOTE, usuario='ijfaneite')
+    pendientes = list(entidades or ENTIDADES)
+
+    db = Prisma()
+    await db.connect()
+    informes = []
+    contexto: dict = {}
+    try:
+        hechas: set[str] = set()
+        while pendientes:
+            # En cada ronda van en paralelo las entidades cuyas dependencias ya cargaron
+            ronda = [e for e in pendientes if all(d in hechas or d not in pendientes for d in ENTIDADES[e]['depende'])]
+            informes += await asyncio.gather(*(cargar_entidad(db, e, args, contexto) for e in ronda))
+            hechas.update(ronda)
+            pendientes = [e for e in pendientes if e not in hechas]
+    finally:
+        await db.disconnect()
+
+    if not args.simular:
+        invalidar_caches([i['entidad'] for i in informes if i['escritos']])
+    imprimir_informe(informes)
+    return informes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entidades', nargs='*', metavar='entidad', help=f"{', '.join(ENTIDADES)} (por defecto todas)")
+    parser.add_argument('--simular', action='store_true', help='Calcula el diff contra la base sin escribir (dry-run)')
+    parser.add_argument('--solo-cambios', action='store_true', help='Envía solo filas nuevas o modificadas')
+    parser.add_argument('--chunk', type=int, default=CHUNK_CSV, help='Filas del CSV por bloque de lectura')
+    parser.add_argument('--lote', type=int, default=FILAS_POR_LOTE, help='Filas por INSERT multi-fila')
+    parser.add_argument('--usuario', default='ijfaneite', help='Valor de createdBy/updatedBy')
+    args = parser.parse_args()
+    desconocidas = set(args.entidades) - set(ENTIDADES)
+    if desconocidas:
+        parser.error(f"entidades desconocidas: {', '.join(sorted(desconocidas))}")
+    # Respetamos el orden de dependencias aunque se pidan en otro orden
+    entidades = [e for e in ENTIDADES if e in args.entidades] or None
+    asyncio.run(cargar(entidades, args))
+
+
+if __name__ == '__main__':
+    main()
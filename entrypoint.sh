@@ -34,4 +34,4 @@ prisma generate
 echo "Configuración de Prisma completada."
 
 echo "Iniciando servidor con Gunicorn..."
-exec gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app
\ No newline at end of file
+exec gunicorn -c gunicorn.conf.py -w 4 -k uvicorn.workers.UvicornWorker main:app
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""Verifica con EXPLAIN que las consultas calientes de pedidos.py y clientes.py usan índices.
+
+Siembra un volumen sintético grande en la base local (DATABASE_URL), ejecuta ANALYZE,
+revisa el plan de cada consulta y al final borra lo sembrado. Sale con código 1 si
+alguna consulta recorre secuencialmente su tabla principal.
+
+    python explainIndices.py --pedidos 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+MARCA = 'explain-harness'
+HOSTS_LOCALES = {'localhost', '127.0.0.1', '::1', 'saporive-db'}
+LOTE = 50_000
+
+# (nombre, tabla principal, SQL equivalente al que genera Prisma, parámetros)
+CONSULTAS = [
+    (
+        'read_pedidos: primera página',
+        'Pedido',
+        'SELECT * FROM "Pedido" ORDER BY "createdAt" DESC, "idPedido" DESC LIMIT 101',
+        [],
+    ),
+    (
+        'read_pedidos: página siguiente por cursor',
+        'Pedido',
+        'SELECT * FROM "Pedido" WHERE ("createdAt" < $1::timestamp '
+        'OR ("createdAt" = $1::timestamp AND "idPedido" < $2)) '
+        'ORDER BY "createdAt" DESC, "idPedido" DESC LIMIT 101',
+        ['cursor_fecha', 'cursor_id'],
+    ),
+    (
+        'read_pedidos: filtro por asesor',
+        'Pedido',
+        'SELECT * FROM "Pedido" WHERE "idAsesor" = $1 ORDER BY "createdAt" DESC, "idPedido" DESC LIMIT 101',
+        ['asesor'],
+    ),
+    (
+        'read_pedidos: filtro por cliente',
+        'Pedido',
+        'SELECT * FROM "Pedido" WHERE "idCliente" = $1 ORDER BY "createdAt" DESC, "idPedido" DESC LIMIT 101',
+        ['cliente'],
+    ),
+    (
+        'read_pedidos: filtro por Status',
+        'Pedido',
+        'SELECT * FROM "Pedido" WHERE "Status" = $1 ORDER BY "createdAt" DESC, "idPedido" DESC LIMIT 101',
+        ['status'],
+    ),
+    (
+        'read_pedidos: rango de fechaPedido',
+        'Pedido',
+        'SELECT * FROM "Pedido" WHERE "fechaPedido" >= $1::timestamp AND "fechaPedido" <= $1::timestamp + interval \'1 day\'',
+        ['cursor_fecha'],
+    ),
+    (
+        'read_pedido: include detalles',
+        'DetallePedido',
+        'SELECT * FROM "DetallePedido" WHERE "idPedido" IN ($1, $2)',
+        ['pedido', 'pedido2'],
+    ),
+    (
+        'delete_pedido: borrado en cascada de detalles',
+        'DetallePedido',
+        'SELECT 1 FROM "DetallePedido" WHERE "idPedido" = $1',
+        ['pedido'],
+    ),
+    (
+        'read_clientes: primera página',
+        'Cliente',
+        'SELECT * FROM "Cliente" ORDER BY "createdAt" DESC, "idCliente" DESC LIMIT 101',
+        [],
+    ),
+    (
+        'read_clientes: filtro por asesor',
+        'Cliente',
+        'SELECT * FROM "Cliente" WHERE "idAsesor" = $1 ORDER BY "createdAt" DESC, "idCliente" DESC LIMIT 101',
+        ['asesor'],
+    ),
+]
+
+
+async def sembrar(db: Prisma, pedidos: int, clientes: int, asesores: int, productos: int):
+    print(f"Sembrando {asesores} asesores, {productos} productos, {clientes} clientes y {pedidos} pedidos...")
+    await db.execute_raw(
+        'INSERT INTO "Asesor" ("idAsesor", "Asesor", "createdAt", "updatedAt", "createdBy", "updatedBy") '
+        "SELECT 'EXP-A' || g, 'Asesor ' || g, now(), now(), $1, $1 FROM generate_series(1, $2::int) g",
+        MARCA, asesores,
+    )
+    await db.execute_raw(
+        'INSERT INTO "Producto" ("idProducto", "Producto", "Precio", "createdAt", "updatedAt", "createdBy", "updatedBy") '
+        "SELECT 'EXP-PR' || g, 'Producto ' || g, 1 + g % 20, now(), now(), $1, $1 FROM generate_series(1, $2::int) g",
+        MARCA, productos,
+    )
+    await db.execute_raw(
+        'INSERT INTO "Cliente" ("idCliente", "Rif", "Cliente", "Zona", "idAsesor", "createdAt", "updatedAt", "createdBy", "updatedBy") '
+        "SELECT 'EXP-C' || g, 'EXP-R' || g, 'Cliente ' || g, (ARRAY['CARABOBO','ARAGUA','CARACAS','LARA'])[1 + g % 4], "
+        "'EXP-A' || (1 + g % $3::int), now() - g * interval '1 minute', now(), $1, $1 "
+        "FROM generate_series(1, $2::int) g",
+        MARCA, clientes, asesores,
+    )
+    for desde in range(1, pedidos + 1, LOTE):
+        hasta = min(desde + LOTE - 1, pedidos)
+        await db.execute_raw(
+            'INSERT INTO "Pedido" ("idPedido", "idEmpresa", "fechaPedido", "totalPedido", "idAsesor", "Status", "idCliente", '
+            '"createdAt", "updatedAt", "createdBy", "updatedBy") '
+            "SELECT 'EXP-P' || g, 1, now() - (g % 730) * interval '1 day', 100, 'EXP-A' || (1 + g % $4::int), "
+            "(ARRAY['pendiente','facturado','anulado'])[1 + g % 3], 'EXP-C' || (1 + g % $5::int), "
+            "now() - g * interval '1 second', now(), $1, $1 FROM generate_series($2::int, $3::int) g",
+            MARCA, desde, hasta, asesores, clientes,
+        )
+        await db.execute_raw(
+            'INSERT INTO "DetallePedido" ("id", "idPedido", "idProducto", "Precio", "Cantidad", "Total", '
+            '"createdAt", "updatedAt", "createdBy", "updatedBy") '
+            "SELECT gen_random_uuid()::text, 'EXP-P' || g, 'EXP-PR' || (1 + (g + l) % $4::int), 10, l, 10 * l, "
+            "now() - g * interval '1 second', now(), $1, $1 "
+            "FROM generate_series($2::int, $3::int) g, generate_series(1, 5) l",
+            MARCA, desde, hasta, productos,
+        )
+        print(f"  {hasta}/{pedidos}")
+    await db.execute_raw('ANALYZE "Asesor", "Producto", "Cliente", "Pedido", "DetallePedido"')
+
+
+async def limpiar(db: Prisma):
+    print("Borrando datos sembrados...")
+    # Los detalles se van en cascada con sus pedidos
+    await db.execute_raw('DELETE FROM "Pedido" WHERE "createdBy" = $1', MARCA)
+    await db.execute_raw('DELETE FROM "Cliente" WHERE "createdBy" = $1', MARCA)
+    await db.execute_raw('DELETE FROM "Producto" WHERE "createdBy" = $1', MARCA)
+    await db.execute_raw('DELETE FROM "Asesor" WHERE "createdBy" = $1', MARCA)
+
+
+def nodos(plan: dict):
+    yield plan
+    for hijo in plan.get('Plans', []):
+        yield from nodos(hijo)
+
+
+def revisar_plan(plan: dict, tabla: str) -> tuple[bool, str]:
+    encontrados = [(n['Node Type'], n.get('Relation Name'), n.get('Index Name')) for n in nodos(plan)]
+    secuencial = any(tipo == 'Seq Scan' and rel == tabla for tipo, rel, _ in encontrados)
+    indices = [idx for tipo, _, idx in encontrados if 'Index' in tipo and idx]
+    ok = not secuencial and bool(indices)
+    resumen = ', '.join(indices) if indices else 'sin índice'
+    if secuencial:
+        resumen += f' (Seq Scan sobre "{tabla}")'
+    return ok, resumen
+
+
+async def verificar(db: Prisma, pedidos: int) -> bool:
+    medio = pedidos // 2
+    ref = await db.query_first('SELECT "createdAt"::text AS c FROM "Pedido" WHERE "idPedido" = $1', f'EXP-P{medio}')
+    valores = {
+        'cursor_fecha': ref['c'],
+        'cursor_id': f'EXP-P{medio}',
+        'asesor': 'EXP-A1',
+        'cliente': 'EXP-C1',
+        'status': 'facturado',
+        'pedido': f'EXP-P{medio}',
+        'pedido2': f'EXP-P{medio + 1}',
+    }
+
+    todo_ok = True
+    for nombre, tabla, sql, params in CONSULTAS:
+        filas = await db.query_raw(f'EXPLAIN (FORMAT JSON) {sql}', *[valores[p] for p in params])
+        salida = filas[0]['QUERY PLAN']
+        if isinstance(salida, str):
+            salida = json.loads(salida)
+        ok, resumen = revisar_plan(salida[0]['Plan'], tabla)
+        todo_ok = todo_ok and ok
+        print(f"{'OK   ' if ok else 'FALLA'} {nombre}: {resumen}")
+    return todo_ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=200_000)
+    parser.add_argument('--clientes', type=int, default=5_000)
+    parser.add_argument('--asesores', type=int, default=25)
+    parser.add_argument('--productos', type=int, default=40)
+    parser.add_argument('--conservar', action='store_true', help='No borrar los datos sembrados al terminar')
+    parser.add_argument('--forzar', action='store_true', help='Permitir una base que no sea local')
+    args = parser.parse_args()
+
+    url = os.environ['DATABASE_URL']
+    if urlsplit(url).hostname not in HOSTS_LOCALES and not args.forzar:
+        print("DATABASE_URL no apunta a una base local; usa --forzar si es intencional.")
+        sys.exit(2)
+
+    db = Prisma(http={'timeout': None}, connect_timeout=timedelta(seconds=30))
+    await db.connect()
+    try:
+        await limpiar(db)
+        await sembrar(db, args.pedidos, args.clientes, args.asesores, args.productos)
+        ok = await verificar(db, args.pedidos)
+    finally:
+        if not args.conservar:
+            await limpiar(db)
+        await db.disconnect()
+
+    print("Todas las consultas usan índices." if ok else "Hay consultas sin índice.")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
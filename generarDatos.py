@@ -0,0 +1,304 @@
+"""Genera un historial sintético de pedidos a gran escala para pruebas de volumen.
+
+Los maestros reales son pocos (Clientes.csv, productos.csv, asesores.csv); lo que crece
+sin límite es el historial de pedidos. Este script lo fabrica con distribuciones sacadas
+de esos CSV, para probar GET /pedidos/, los borrados en cascada y /reportes con millones
+de filas:
+
+  clientes     cada cliente tiene una actividad lognormal; la cartera de cada asesor y la
+               mezcla de zonas salen tal cual de Clientes.csv
+  productos    popularidad tipo Zipf (orden fijado por la semilla), con preferencia por
+               las presentaciones más baratas
+  cesta        líneas por pedido binomial negativa (media ~12), sin productos repetidos
+  cantidades   geométrica, 1 a 60 unidades
+  estacionalidad  sin ventas los domingos, sábados a media jornada, pico en diciembre y
+               bajón en enero, crecimiento anual; horario de 7 a 18 (hora de Caracas)
+  precios      el de productos.csv, con inflación hacia atrás en el tiempo
+  status       según la antigüedad del pedido (Pendiente → Entregado, algunos Anulados)
+
+Es determinista: con la misma --semilla, --escala, --hasta, --anios, --inicio, --bloque y
+maestros genera las mismas filas. Cada bloque usa su propio generador, derivado de la
+semilla y del número absoluto de su primer pedido, así que el resultado no depende del
+orden en que se escriban y ampliar con --inicio genera pedidos nuevos, no copias de los
+anteriores. --hasta es hoy si no se indica: el script imprime los parámetros para repetir
+la carga. Los maestros deben estar cargados (cargaMaestros.py).
+
+Cada bloque se envía como un único parámetro JSON por columnas y Postgres lo desarma con
+json_array_elements_text: una sentencia por tabla y bloque, sin límite de parámetros.
+Con --diferir-indices se quitan los índices secundarios de Pedido/DetallePedido durante
+la carga y se recrean al final (mucho más rápido para cargas grandes).
+
+    python generarDatos.py --escala 1            # 1M pedidos, ~12M líneas
+    python generarDatos.py --escala 0.05 --semilla 7
+    python generarDatos.py --borrar              # elimina lo generado (mide el borrado en cascada)
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import orjson
+import pandas as pd
+from dotenv import load_dotenv
+from prisma import Prisma
+
+from app.resumen import reconstruir_resumen
+from cargaMaestros import ENTIDADES, limpiar
+
+load_dotenv()
+
+PEDIDOS_POR_ESCALA = 1_000_000
+PEDIDOS_POR_BLOQUE = 10_000
+ESCRITURAS_CONCURRENTES = 4
+PREFIJO = 'SIN'
+SEMILLA = 1
+USUARIO = 'generador'
+
+# Caracas está en UTC-4 todo el año; Prisma guarda UTC sin zona
+DESFASE_UTC = np.timedelta64(4, 'h')
+PESO_DIA_SEMANA = [1.0, 1.0, 1.0, 1.0, 1.1, 0.5, 0.0]   # lunes..domingo
+PESO_MES = [0.7, 0.85, 0.95, 0.95, 1.0, 1.0, 1.05, 1.1, 1.0, 1.05, 1.15, 1.4]
+CRECIMIENTO_ANUAL = 0.15
+INFLACION_ANUAL = 0.10
+
+INSERTAR_PEDIDOS = '''
+INSERT INTO "Pedido" ("idPedido", "idEmpresa", "fechaPedido", "totalPedido", "idAsesor", "Status",
+                      "idCliente", "createdAt", "updatedAt", "createdBy", "updatedBy")
+SELECT id, $2::int, fecha::timestamp(3), total::float8, asesor, status, cliente,
+       fecha::timestamp(3) + interval '1 minute', fecha::timestamp(3) + interval '1 minute', $3, $3
+FROM (SELECT $1::json AS j) d, ROWS FROM (
+    json_array_elements_text(d.j -> 'id'), json_array_elements_text(d.j -> 'fecha'),
+    json_array_elements_text(d.j -> 'total'), json_array_elements_text(d.j -> 'asesor'),
+    json_array_elements_text(d.j -> 'status'), json_array_elements_text(d.j -> 'cliente')
+) AS x(id, fecha, total, asesor, status, cliente)
+'''
+
+INSERTAR_DETALLES = '''
+INSERT INTO "DetallePedido" ("id", "idPedido", "idProducto", "Precio", "Cantidad", "Total",
+                             "createdAt", "updatedAt", "createdBy", "updatedBy")
+SELECT id, pedido, producto, precio::float8, cantidad::int, total::float8,
+       fecha::timestamp(3) + interval '1 minute', fecha::timestamp(3) + interval '1 minute', $2, $2
+FROM (SELECT $1::json AS j) d, ROWS FROM (
+    json_array_elements_text(d.j -> 'id'), json_array_elements_text(d.j -> 'pedido'),
+    json_array_elements_text(d.j -> 'producto'), json_array_elements_text(d.j -> 'precio'),
+    json_array_elements_text(d.j -> 'cantidad'), json_array_elements_text(d.j -> 'total'),
+    json_array_elements_text(d.j -> 'fecha')
+) AS x(id, pedido, producto, precio, cantidad, total, fecha)
+'''
+
+
+# --- DISTRIBUCIONES ---
+class Modelo:
+    """Pesos y tablas fijas que comparten todos los bloques (dependen solo de la semilla)."""
+
+    def __init__(self, clientes: pd.DataFrame, productos: pd.DataFrame, desde: date, hasta: date, semilla: int):
+        rng = np.random.default_rng([semilla, 0])
+        self.id_cliente = clientes['idCliente'].to_numpy()
+        self.id_asesor = clientes['idAsesor'].to_numpy()
+        actividad = rng.lognormal(0.0, 1.0, len(clientes))
+        self.p_cliente = actividad / actividad.sum()
+
+        self.id_producto = productos['idProducto'].to_numpy()
+        self.precio = productos['Precio'].to_numpy(dtype=float)
+        rango = rng.permutation(len(productos)) + 1
+        popularidad = rango ** -0.9 / np.sqrt(self.precio)
+        self.log_p_producto = np.log(popularidad / popularidad.sum())
+
+        dias = pd.date_range(desde, hasta, freq='D')
+        anios = (dias - dias[0]).days.to_numpy() / 365.25
+        peso = (
+            np.array(PESO_DIA_SEMANA)[dias.dayofweek.to_numpy()]
+            * np.array(PESO_MES)[dias.month.to_numpy() - 1]
+            * (1 + CRECIMIENTO_ANUAL) ** anios
+        )
+        self.dias = dias.to_numpy().astype('datetime64[s]')
+        self.p_dia = peso / peso.sum()
+        # Precio relativo al actual: más bajo cuanto más viejo el pedido
+        self.factor_precio = (1 + INFLACION_ANUAL) ** (anios - anios[-1])
+        self.hoy = self.dias[-1]
+
+
+def generar_bloque(modelo: Modelo, desde_n: int, cantidad: int, semilla: int) -> tuple[dict, dict]:
+    # Semilla por número absoluto de pedido (el 0 es del Modelo): no se repite entre cargas con --inicio
+    rng = np.random.default_rng([semilla, desde_n + 1])
+    n = cantidad
+
+    cliente = rng.choice(len(modelo.id_cliente), n, p=modelo.p_cliente)
+    dia = rng.choice(len(modelo.dias), n, p=modelo.p_dia)
+    segundos = rng.integers(7 * 3600, 18 * 3600, n).astype('timedelta64[s]')
+    fecha = modelo.dias[dia] + segundos + DESFASE_UTC
+    ms = rng.integers(0, 1000, n).astype('timedelta64[ms]')
+    fecha = fecha.astype('datetime64[ms]') + ms
+
+    # Cesta: k productos distintos por pedido con top-k de Gumbel sobre la popularidad
+    total_productos = len(modelo.id_producto)
+    lineas = np.clip(1 + rng.negative_binomial(3, 3 / 14, n), 1, total_productos)
+    claves = modelo.log_p_producto + rng.gumbel(size=(n, total_productos))
+    orden = np.argsort(-claves, axis=1)
+    mascara = np.arange(total_productos) < lineas[:, None]
+    producto = orden[mascara]
+    pedido_de_linea = np.repeat(np.arange(n), lineas)
+
+    cantidad_linea = np.minimum(rng.geometric(0.2, len(producto)), 60)
+    precio = np.round(modelo.precio[producto] * modelo.factor_precio[dia[pedido_de_linea]], 2)
+    total_linea = np.round(precio * cantidad_linea, 2)
+    inicios = np.concatenate(([0], np.cumsum(lineas)[:-1]))
+    total_pedido = np.round(np.add.reduceat(total_linea, inicios), 2)
+
+    antiguedad = (modelo.hoy - modelo.dias[dia]).astype('timedelta64[D]').astype(int)
+    azar = rng.random(n)
+    status = np.where(
+        antiguedad < 2, np.where(azar < 0.6, 'Pendiente', 'Aprobado'),
+        np.where(antiguedad < 7, np.where(azar < 0.7, 'Despachado', 'Entregado'),
+                 np.where(azar < 0.03, 'Anulado', 'Entregado')),
+    )
+
+    ids = [f'{PREFIJO}{semilla}-{desde_n + i:09d}' for i in range(n)]
+    texto_fecha = np.datetime_as_string(fecha, unit='ms').tolist()
+    pedidos = {
+        'id': ids,
+        'fecha': texto_fecha,
+        'total': total_pedido.tolist(),
+        'asesor': modelo.id_asesor[cliente].tolist(),
+        'status': status.tolist(),
+        'cliente': modelo.id_cliente[cliente].tolist(),
+    }
+    # Posición de cada línea dentro de su pedido: id determinista "<idPedido>-<línea>"
+    posicion = np.arange(len(producto)) - np.repeat(inicios, lineas)
+    detalles = {
+        'id': [f'{ids[p]}-{l:02d}' for p, l in zip(pedido_de_linea.tolist(), posicion.tolist())],
+        'pedido': [ids[p] for p in pedido_de_linea.tolist()],
+        'producto': modelo.id_producto[producto].tolist(),
+        'precio': precio.tolist(),
+        'cantidad': cantidad_linea.tolist(),
+        'total': total_linea.tolist(),
+        'fecha': [texto_fecha[p] for p in pedido_de_linea.tolist()],
+    }
+    return pedidos, detalles
+
+
+# --- BASE DE DATOS ---
+async def maestros(db: Prisma) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Clientes y productos de los CSV (misma limpieza que cargaMaestros.py) que existen en la base."""
+    clientes, _ = limpiar('clientes', pd.read_csv(ENTIDADES['clientes']['archivo'], dtype=str))
+    productos, _ = limpiar('productos', pd.read_csv(ENTIDADES['productos']['archivo'], dtype=str))
+    en_base_c = {f['idCliente'] for f in await db.query_raw('SELECT "idCliente" FROM "Cliente"')}
+    en_base_p = {f['idProducto']: f['Precio'] for f in await db.query_raw('SELECT "idProducto", "Precio" FROM "Producto"')}
+    clientes = clientes[clientes['idCliente'].isin(en_base_c)].drop_duplicates('idCliente')
+    productos = productos[productos['idProducto'].isin(en_base_p.keys())].drop_duplicates('idProducto')
+    if clientes.empty or productos.empty:
+        raise SystemExit('No hay clientes o productos en la base: correr antes cargaMaestros.py')
+    # El orden de los CSV fija qué peso recibe cada uno: se ordena para no depender de la base
+    return clientes.sort_values('idCliente').reset_index(drop=True), productos.sort_values('idProducto').reset_index(drop=True)
+
+
+async def empresa(db: Prisma) -> int:
+    existente = await db.empresa.find_first(where={'RazonSocial': USUARIO})
+    if existente is None:
+        existente = await db.empresa.create(data={'RazonSocial': USUARIO, 'idPedido': 1, 'idRecibo': 1})
+    return existente.idEmpresa
+
+
+async def quitar_indices(db: Prisma) -> list[str]:
+    filas = await db.query_raw(
+        '''SELECT indexname, indexdef FROM pg_indexes
+           WHERE schemaname = current_schema() AND tablename IN ('Pedido', 'DetallePedido')
+             AND indexname NOT LIKE '%_pkey' ''')
+    for f in filas:
+        await db.execute_raw(f'DROP INDEX "{f["indexname"]}"')
+    return [f['indexdef'] for f in filas]
+
+
+async def escribir_bloque(db: Prisma, modelo: Modelo, args, id_empresa: int, indice: int,
+                         en_memoria: asyncio.Semaphore, escrituras: asyncio.Semaphore) -> int:
+    desde_n = args.inicio + indice * args.bloque
+    cantidad = min(args.bloque, args.inicio + args.total - desde_n)
+    # Solo se genera un bloque con lugar en memoria (--concurrencia + 1): uno se prepara
+    # en un hilo (numpy) mientras los demás se escriben, sin acumular bloques sin escribir
+    async with en_memoria:
+        pedidos, detalles = await asyncio.to_thread(generar_bloque, modelo, desde_n, cantidad, args.semilla)
+        async with escrituras:
+            async with db.tx(timeout=timedelta(minutes=5), max_wait=timedelta(minutes=5)) as transaction:
+                # La durabilidad de cada commit no importa en una carga que se puede repetir
+                await transaction.execute_raw('SET LOCAL synchronous_commit = off')
+                await transaction.execute_raw(INSERTAR_PEDIDOS, orjson.dumps(pedidos).decode(), id_empresa, USUARIO)
+                await transaction.execute_raw(INSERTAR_DETALLES, orjson.dumps(detalles).decode(), USUARIO)
+    return len(detalles['id'])
+
+
+async def generar(db: Prisma, args):
+    clientes, productos = await maestros(db)
+    hasta = date.fromisoformat(args.hasta) if args.hasta else date.today()
+    modelo = Modelo(clientes, productos, hasta - timedelta(days=round(args.anios * 365.25)), hasta, args.semilla)
+    id_empresa = await empresa(db)
+    bloques = -(-args.total // args.bloque)
+    print(f"{args.total:,} pedidos en {bloques} bloques ({len(clientes)} clientes, {len(productos)} productos, "
+          f"{modelo.dias[0].astype(datetime).date()} a {hasta})")
+    print(f"Para repetirla: --semilla {args.semilla} --escala {args.escala} --anios {args.anios} "
+          f"--hasta {hasta.isoformat()} --inicio {args.inicio} --bloque {args.bloque}")
+
+    indices = await quitar_indices(db) if args.diferir_indices else []
+    inicio = time.perf_counter()
+    lineas = 0
+    en_memoria = asyncio.Semaphore(args.concurrencia + 1)
+    escrituras = asyncio.Semaphore(args.concurrencia)
+    try:
+        tareas = [escribir_bloque(db, modelo, args, id_empresa, i, en_memoria, escrituras) for i in range(bloques)]
+        for hechos, tarea in enumerate(asyncio.as_completed(tareas), 1):
+            lineas += await tarea
+            transcurrido = time.perf_counter() - inicio
+            print(f"\r  bloque {hechos}/{bloques}: {lineas:,} líneas, {lineas / transcurrido:,.0f} líneas/s", end='', flush=True)
+        print()
+    finally:
+        # Los índices vuelven siempre, aunque la carga se haya cortado
+        for definicion in indices:
+            t = time.perf_counter()
+            await db.execute_raw(definicion)
+            print(f"  {definicion.split(' ON ')[0]}: {time.perf_counter() - t:.1f}s")
+    print(f"Carga: {time.perf_counter() - inicio:.1f}s")
+
+
+async def borrar(db: Prisma, semilla: int | None):
+    patron = f'{PREFIJO}{semilla}-%' if semilla is not None else f'{PREFIJO}%-%'
+    inicio = time.perf_counter()
+    borrados = await db.execute_raw('DELETE FROM "Pedido" WHERE "idPedido" LIKE $1', patron)
+    print(f"{borrados:,} pedidos borrados (con sus líneas en cascada) en {time.perf_counter() - inicio:.1f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', type=float, default=1.0, help=f'Múltiplo de {PEDIDOS_POR_ESCALA:,} pedidos')
+    parser.add_argument('--semilla', type=int, help=f'Por defecto {SEMILLA}; con --borrar, sin semilla borra todo lo generado')
+    parser.add_argument('--anios', type=float, default=3.0, help='Años de historial')
+    parser.add_argument('--hasta', help='Último día del historial (AAAA-MM-DD, por defecto hoy; fijarlo para repetir una carga)')
+    parser.add_argument('--inicio', type=int, default=0, help='Primer número de pedido (para ampliar una carga previa)')
+    parser.add_argument('--bloque', type=int, default=PEDIDOS_POR_BLOQUE, help='Pedidos por transacción')
+    parser.add_argument('--concurrencia', type=int, default=ESCRITURAS_CONCURRENTES, help='Bloques escribiéndose a la vez')
+    parser.add_argument('--diferir-indices', action='store_true', help='Quita los índices secundarios y los recrea al final')
+    parser.add_argument('--sin-resumen', action='store_true', help='No reconstruye los resúmenes de ventas al terminar')
+    parser.add_argument('--borrar', action='store_true', help='Borra los pedidos generados (de --semilla si se indica)')
+    args = parser.parse_args()
+    args.total = round(args.escala * PEDIDOS_POR_ESCALA)
+
+    db = Prisma()
+    await db.connect()
+    try:
+        if args.borrar:
+            await borrar(db, args.semilla)
+        else:
+            args.semilla = SEMILLA if args.semilla is None else args.semilla
+            await generar(db, args)
+        if not args.sin_resumen:
+            t = time.perf_counter()
+            async with db.tx(timeout=timedelta(hours=2), max_wait=timedelta(seconds=30)) as transaction:
+                await reconstruir_resumen(transaction)
+            print(f"Resúmenes de ventas reconstruidos en {time.perf_counter() - t:.1f}s")
+        # Estadísticas al día para que el planificador vea el volumen nuevo
+        await db.execute_raw('ANALYZE "Pedido", "DetallePedido"')
+    finally:
+        await db.disconnect()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,24 @@
+# Configuración compartida de gunicorn (entrypoint.sh / devserver.sh pasan -c gunicorn.conf.py)
+import os
+import shutil
+import tempfile
+
+# Directorio donde cada worker escribe sus métricas; /metrics las suma (app/metricas.py).
+# Se define aquí para que los workers lo hereden antes de importar prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "saporive-metrics"))
+
+
+def on_starting(server):
+    # Los workers heredan el entorno: app/ritmo.py reparte los límites de ritmo entre ellos
+    os.environ["GUNICORN_WORKERS"] = str(server.cfg.workers)
+
+    # Los archivos de una ejecución anterior falsearían los contadores
+    directorio = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Los gauges "live" de un worker muerto dejan de sumar
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,10 +1,20 @@
 from fastapi import FastAPI
+from app.admision import AdmisionMiddleware
+from app.compresion import CompresionMiddleware
+from app.database import lifespan
+from app.metricas import MetricasMiddleware, router as metricas_router
+from app.trazas import TrazasMiddleware
+from app.pagination import NEXT_CURSOR_HEADER
+from app.serializacion import RespuestaJSON
 from app.routes import auth, empresas  # Importamos el nuevo router de empresas
 from app.routes.asesores import router as asesores_router
 from app.routes.productos import router as productos_router
 from app.routes.clientes import router as clientes_router
 from app.routes.pedidos import router as pedidos_router
 from app.routes.detalle_pedidos import router as detalle_pedidos_router
+from app.routes.sync import router as sync_router
+from app.routes.reportes import router as reportes_router
+from app.routes.eventos import router as eventos_router
 from fastapi.middleware.cors import CORSMiddleware
 
 import os
@@ -15,7 +25,13 @@ os.environ['TZ'] = 'America/Caracas'
 if hasattr(time, 'tzset'):
     time.tzset()
     
-app = FastAPI()
+# El cliente Prisma se conecta una vez por worker y se libera al apagar.
+# Las respuestas se serializan con orjson (los listados usan app.serializacion.lista_json)
+app = FastAPI(lifespan=lifespan, default_response_class=RespuestaJSON)
+
+# Límite por usuario y tope de peticiones simultáneas (ver app/admision.py); es el más
+# interno para que los 429/503 lleven CORS y queden en las métricas
+app.add_middleware(AdmisionMiddleware)
 
 # Configuración de CORS permisiva para desarrollo
 app.add_middleware(
@@ -24,8 +40,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  
     allow_headers=["*"],  
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Idempotent-Replayed", "Retry-After"],  # Cursor de paginación, versión de catálogos, respuesta repetida, espera tras 429/503
 )
 
+# Compresión gzip/br/zstd negociada con Accept-Encoding (ver app/compresion.py)
+app.add_middleware(CompresionMiddleware)
+
+# Traza de consultas por petición: avisa de posibles N+1 (ver app/trazas.py)
+app.add_middleware(TrazasMiddleware)
+
+# Latencia, códigos y consultas por ruta; se agrega al final para medir todo lo anterior
+app.add_middleware(MetricasMiddleware)
+
 # Registro de rutas (routers)
 app.include_router(auth.router)
 app.include_router(empresas.router, tags=["Empresas"]) # Registro de la nueva ruta de Empresas
@@ -33,4 +59,8 @@ app.include_router(asesores_router, tags=["Asesores"])
 app.include_router(productos_router, tags=["Productos"])
 app.include_router(clientes_router, tags=["Clientes"])
 app.include_router(pedidos_router, tags=["Pedidos"])
-app.include_router(detalle_pedidos_router, tags=["DetallePedidos"])
\ No newline at end of file
+app.include_router(detalle_pedidos_router, tags=["DetallePedidos"])
+app.include_router(sync_router, tags=["Sync"])
+app.include_router(reportes_router, tags=["Reportes"])
+app.include_router(eventos_router, tags=["Eventos"])  # Cambios de pedidos en vivo (SSE / WebSocket)
+app.include_router(metricas_router)
\ No newline at end of file
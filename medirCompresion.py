@@ -0,0 +1,74 @@
+"""Mide el compromiso CPU vs. bytes de cada codificación y nivel sobre payloads reales.
+
+Con la API corriendo, descarga sin comprimir (Accept-Encoding: identity) las respuestas
+de los listados y comprime cada una con gzip 1-9 y, si están instalados, brotli 0-11 y
+zstd 1-19. Sirve para elegir COMPRESION_NIVEL_* y COMPRESION_MINIMO (app/compresion.py).
+
+    python medirCompresion.py --url http://localhost:8000 --usuario demo --clave secreto
+"""
+import argparse
+import time
+import zlib
+
+import httpx
+
+from app.compresion import brotli, zstandard
+
+RUTAS = ['/clientes/?limit=500', '/pedidos/?limit=500', '/productos/', '/asesores/', '/detalle_pedidos/?limit=500']
+
+
+def compresores():
+    for nivel in range(1, 10):
+        yield 'gzip', nivel, lambda data, n=nivel: zlib.compress(data, n, wbits=31)
+    if brotli is not None:
+        for nivel in (0, 1, 2, 4, 5, 6, 9, 11):
+            yield 'br', nivel, lambda data, n=nivel: brotli.compress(data, quality=n)
+    if zstandard is not None:
+        for nivel in (1, 3, 6, 9, 12, 19):
+            yield 'zstd', nivel, lambda data, n=nivel: zstandard.ZstdCompressor(level=n).compress(data)
+
+
+def medir(funcion, data: bytes, minimo_segundos: float) -> tuple[int, float]:
+    repeticiones = 0
+    inicio = time.perf_counter()
+    while True:
+        salida = funcion(data)
+        repeticiones += 1
+        transcurrido = time.perf_counter() - inicio
+        if transcurrido >= minimo_segundos:
+            return len(salida), transcurrido / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--usuario', required=True)
+    parser.add_argument('--clave', required=True)
+    parser.add_argument('--ruta', action='append', help='Rutas a medir (por defecto los listados principales)')
+    parser.add_argument('--segundos', type=float, default=0.3, help='Tiempo mínimo de medición por combinación')
+    parser.add_argument('--kbps', type=float, default=256, help='Ancho de banda móvil supuesto para estimar la descarga')
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        r = client.post('/token', data={'username': args.usuario, 'password': args.clave})
+        r.raise_for_status()
+        headers = {'Authorization': f"Bearer {r.json()['access_token']}", 'Accept-Encoding': 'identity'}
+        payloads = {}
+        for ruta in args.ruta or RUTAS:
+            r = client.get(ruta, headers=headers)
+            r.raise_for_status()
+            payloads[ruta] = r.content
+
+    bytes_por_ms = args.kbps * 1024 / 8 / 1000
+    for ruta, data in payloads.items():
+        print(f"\n{ruta}: {len(data) / 1024:.1f} KiB sin comprimir (~{len(data) / bytes_por_ms:.0f} ms a {args.kbps:g} kbps)")
+        print(f"{'codif.':<7}{'nivel':>6}{'KiB':>9}{'ratio':>8}{'ms CPU':>9}{'MB/s':>8}{'ms red':>9}{'ms total':>10}")
+        for nombre, nivel, funcion in compresores():
+            tamano, segundos = medir(funcion, data, args.segundos)
+            red = tamano / bytes_por_ms
+            print(f"{nombre:<7}{nivel:>6}{tamano / 1024:>9.1f}{len(data) / tamano:>8.1f}{segundos * 1000:>9.2f}"
+                  f"{len(data) / segundos / 1e6:>8.0f}{red:>9.0f}{segundos * 1000 + red:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
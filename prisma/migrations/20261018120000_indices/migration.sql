@@ -0,0 +1,29 @@
+-- CreateIndex
+CREATE INDEX "Cliente_idAsesor_idx" ON "Cliente"("idAsesor");
+
+-- CreateIndex
+CREATE INDEX "Cliente_createdAt_idCliente_idx" ON "Cliente"("createdAt", "idCliente");
+
+-- CreateIndex
+CREATE INDEX "DetallePedido_idPedido_idx" ON "DetallePedido"("idPedido");
+
+-- CreateIndex
+CREATE INDEX "DetallePedido_idProducto_idx" ON "DetallePedido"("idProducto");
+
+-- CreateIndex
+CREATE INDEX "DetallePedido_createdAt_id_idx" ON "DetallePedido"("createdAt", "id");
+
+-- CreateIndex
+CREATE INDEX "Pedido_createdAt_idPedido_idx" ON "Pedido"("createdAt", "idPedido");
+
+-- CreateIndex
+CREATE INDEX "Pedido_idAsesor_createdAt_idPedido_idx" ON "Pedido"("idAsesor", "createdAt", "idPedido");
+
+-- CreateIndex
+CREATE INDEX "Pedido_idCliente_createdAt_idPedido_idx" ON "Pedido"("idCliente", "createdAt", "idPedido");
+
+-- CreateIndex
+CREATE INDEX "Pedido_Status_createdAt_idPedido_idx" ON "Pedido"("Status", "createdAt", "idPedido");
+
+-- CreateIndex
+CREATE INDEX "Pedido_fechaPedido_idx" ON "Pedido"("fechaPedido");
@@ -0,0 +1,13 @@
+-- CreateTable
+CREATE TABLE "RegistroEliminado" (
+    "id" SERIAL NOT NULL,
+    "entidad" TEXT NOT NULL,
+    "idRegistro" TEXT NOT NULL,
+    "deletedAt" TIMESTAMP(3) NOT NULL,
+    "deletedBy" TEXT NOT NULL,
+
+    CONSTRAINT "RegistroEliminado_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "RegistroEliminado_deletedAt_idx" ON "RegistroEliminado"("deletedAt");
@@ -0,0 +1,29 @@
+-- CreateTable
+CREATE TABLE "ResumenPedidoDiario" (
+    "fecha" DATE NOT NULL,
+    "idAsesor" TEXT NOT NULL,
+    "idCliente" TEXT NOT NULL,
+    "Status" TEXT NOT NULL,
+    "pedidos" INTEGER NOT NULL,
+    "cantidad" INTEGER NOT NULL,
+    "total" DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT "ResumenPedidoDiario_pkey" PRIMARY KEY ("fecha","idAsesor","idCliente","Status")
+);
+
+-- CreateTable
+CREATE TABLE "ResumenVentaDiaria" (
+    "fecha" DATE NOT NULL,
+    "idAsesor" TEXT NOT NULL,
+    "idCliente" TEXT NOT NULL,
+    "idProducto" TEXT NOT NULL,
+    "Status" TEXT NOT NULL,
+    "pedidos" INTEGER NOT NULL,
+    "cantidad" INTEGER NOT NULL,
+    "total" DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT "ResumenVentaDiaria_pkey" PRIMARY KEY ("fecha","idAsesor","idCliente","idProducto","Status")
+);
+
+-- CreateIndex
+CREATE INDEX "ResumenVentaDiaria_fecha_idProducto_idx" ON "ResumenVentaDiaria"("fecha", "idProducto");
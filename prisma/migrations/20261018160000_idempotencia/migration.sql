@@ -0,0 +1,18 @@
+-- CreateTable
+CREATE TABLE "ClaveIdempotencia" (
+    "username" TEXT NOT NULL,
+    "clave" TEXT NOT NULL,
+    "ruta" TEXT NOT NULL,
+    "huella" TEXT NOT NULL,
+    "status" INTEGER,
+    "respuesta" TEXT,
+    "mediaType" TEXT,
+    "lockedAt" TIMESTAMP(3) NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "expiresAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "ClaveIdempotencia_pkey" PRIMARY KEY ("username","clave")
+);
+
+-- CreateIndex
+CREATE INDEX "ClaveIdempotencia_expiresAt_idx" ON "ClaveIdempotencia"("expiresAt");
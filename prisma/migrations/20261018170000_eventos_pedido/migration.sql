@@ -0,0 +1,16 @@
+-- CreateTable
+CREATE TABLE "EventoPedido" (
+    "id" BIGSERIAL NOT NULL,
+    "tipo" TEXT NOT NULL,
+    "idPedido" TEXT NOT NULL,
+    "idAsesor" TEXT NOT NULL,
+    "idEmpresa" INTEGER NOT NULL,
+    "Status" TEXT NOT NULL,
+    "createdBy" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "EventoPedido_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "EventoPedido_createdAt_idx" ON "EventoPedido"("createdAt");
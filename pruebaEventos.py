@@ -0,0 +1,92 @@
+"""Prueba de punta a punta del canal de eventos de pedidos (app/eventos.py).
+
+Contra la base de desarrollo: abre una suscripción filtrada por un asesor ficticio,
+publica eventos fuera y dentro de una transacción y verifica que lleguen en orden y
+solo los del filtro. También comprueba que un fallo al publicar dentro de una
+transacción se propague (el cambio no debe confirmarse sin su evento). Borra los
+eventos que crea. Sale con código 1 si algo falla.
+
+    python pruebaEventos.py
+"""
+import asyncio
+import sys
+import uuid
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+from app.eventos import ACTUALIZADO, CREADO, STATUS, Suscripcion, central, flujo, publicar  # noqa: E402
+
+USUARIO = 'prueba-eventos'
+
+
+def pedido(id_asesor: str, n: int, status: str = 'Pendiente'):
+    return SimpleNamespace(idPedido=f'PRUEBA-EV-{n}', idAsesor=id_asesor, idEmpresa=0, Status=status)
+
+
+async def recibir(eventos, cantidad: int, espera: float) -> list:
+    recibidos = []
+
+    async def leer():
+        async for evento in eventos:
+            if evento is not None:
+                recibidos.append(evento)
+                if len(recibidos) == cantidad:
+                    return
+
+    try:
+        await asyncio.wait_for(leer(), timeout=espera)
+    except asyncio.TimeoutError:
+        pass
+    return recibidos
+
+
+async def main():
+    db = Prisma()
+    await db.connect()
+    asesor = f'prueba-{uuid.uuid4().hex[:8]}'
+    errores = []
+    try:
+        eventos = flujo(db, Suscripcion(idAsesor=asesor), None, latido=0.5)
+        primero = asyncio.create_task(recibir(eventos, 3, 10))
+        await asyncio.sleep(0.5)  # la Central ya tomó su marca de agua
+
+        await publicar(db, CREADO, [pedido(asesor, 1)], USUARIO)
+        await publicar(db, CREADO, [pedido('otro-asesor', 2)], USUARIO)  # no debe llegar (filtro)
+        async with db.tx() as transaction:
+            await publicar(transaction, STATUS, [pedido(asesor, 1, 'Aprobado')], USUARIO)
+        await publicar(db, ACTUALIZADO, [pedido(asesor, 1, 'Aprobado')], USUARIO)
+
+        recibidos = await primero
+        tipos = [e.tipo for e in recibidos]
+        if tipos != [CREADO, STATUS, ACTUALIZADO]:
+            errores.append(f'se esperaban creado, status, actualizado; llegaron {tipos}')
+        ids = [e.id for e in recibidos]
+        if ids != sorted(ids):
+            errores.append(f'eventos fuera de orden: {ids}')
+
+        # Dentro de una transacción el error no se oculta: la escritura no puede quedar sin evento
+        try:
+            async with db.tx() as transaction:
+                await publicar(transaction, CREADO, [SimpleNamespace(idPedido='x', idAsesor=asesor, idEmpresa='no-es-int', Status='x')], USUARIO)
+            errores.append('publicar dentro de una transacción no propagó el error')
+        except Exception:
+            pass
+        print(f'{len(recibidos)} eventos recibidos por {central.suscriptores} suscriptor(es): {tipos}')
+    finally:
+        await db.execute_raw('DELETE FROM "EventoPedido" WHERE "createdBy" = $1', USUARIO)
+        await db.disconnect()
+
+    if errores:
+        print('FALLA:')
+        for e in errores:
+            print(f'  {e}')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+"""Reconstruye los resúmenes diarios de ventas (ResumenPedidoDiario, ResumenVentaDiaria).
+
+La API los mantiene al día en cada escritura de pedidos y detalles; este script los
+recalcula completos desde cero. Usarlo tras aplicar la migración, después de cargas
+hechas fuera de la API o si el log muestra fallos al actualizar el resumen.
+
+    python reconstruirResumen.py
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+from app.resumen import reconstruir_resumen
+
+load_dotenv()
+
+
+async def main():
+    db = Prisma()
+    await db.connect()
+    try:
+        inicio = time.perf_counter()
+        # Todo en una transacción: los reportes nunca ven los resúmenes a medio llenar
+        async with db.tx(timeout=timedelta(minutes=30), max_wait=timedelta(seconds=30)) as transaction:
+            pedidos, productos = await reconstruir_resumen(transaction)
+        print(f"ResumenPedidoDiario: {pedidos} filas, ResumenVentaDiaria: {productos} filas "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Prueba de estrés del reservador de numeración (app/numeracion.py).
+
+Crea una empresa temporal y simula varios workers (un cliente Prisma cada uno) que
+reservan bloques de números en paralelo. Verifica que ningún número se entregue dos
+veces y que los bloques cubran el rango sin huecos. Sale con código 1 si falla.
+
+    python stressNumeracion.py --workers 4 --concurrencia 25 --reservas 40
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+from app.numeracion import SERIES, reservar_numeros
+
+load_dotenv()
+
+
+async def worker(db: Prisma, id_empresa: int, serie: str, concurrencia: int, reservas: int, bloque_max: int, rng: random.Random):
+    rangos = []
+
+    async def tarea():
+        for _ in range(reservas):
+            cantidad = rng.randint(1, bloque_max)
+            rangos.append(await reservar_numeros(db, id_empresa, serie, cantidad))
+
+    await asyncio.gather(*(tarea() for _ in range(concurrencia)))
+    return rangos
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='Clientes Prisma independientes (simulan workers de gunicorn)')
+    parser.add_argument('--concurrencia', type=int, default=25, help='Tareas concurrentes por worker')
+    parser.add_argument('--reservas', type=int, default=40, help='Reservas por tarea')
+    parser.add_argument('--bloque-max', type=int, default=50)
+    parser.add_argument('--serie', choices=SERIES, default='pedido')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    clientes = [Prisma() for _ in range(args.workers)]
+    for db in clientes:
+        await db.connect()
+
+    empresa = await clientes[0].empresa.create(data={'RazonSocial': 'stress-numeracion', 'idPedido': 1, 'idRecibo': 1})
+    try:
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(
+            worker(db, empresa.idEmpresa, args.serie, args.concurrencia, args.reservas, args.bloque_max, random.Random(args.semilla + i))
+            for i, db in enumerate(clientes)
+        ))
+        duracion = time.perf_counter() - inicio
+    finally:
+        await clientes[0].empresa.delete(where={'idEmpresa': empresa.idEmpresa})
+        for db in clientes:
+            await db.disconnect()
+
+    rangos = sorted(r for rs in resultados for r in rs)
+    errores = []
+    esperado = 1
+    for desde, hasta in rangos:
+        if desde != esperado:
+            errores.append(f"{'solapado' if desde < esperado else 'hueco'} en {desde}-{hasta} (se esperaba {esperado})")
+        esperado = max(esperado, hasta + 1)
+
+    entregados = sum(hasta - desde + 1 for desde, hasta in rangos)
+    print(f"{len(rangos)} reservas, {entregados} números en {duracion:.2f}s ({len(rangos) / duracion:.0f} reservas/s)")
+    if errores:
+        print("FALLA:")
+        for e in errores[:20]:
+            print(f"  {e}")
+        sys.exit(1)
+    print("OK: sin duplicados ni huecos.")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
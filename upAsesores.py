@@ -1,44 +1,11 @@
 import asyncio
-import pandas as pd
-from prisma import Prisma
-import uuid
 
-async def import_asesores():
-    db = Prisma()
-    await db.connect()
-
-    # Leer el CSV
-    df = pd.read_csv('asesores.csv')
-    
-    # Eliminar duplicados en el DataFrame basados en CodAsesor para evitar errores
-    df = df.drop_duplicates(subset=['idAsesor'])
+from cargaMaestros import cargar
 
-    print(f"Cargando {len(df)} asesores únicos...")
 
-    for index, row in df.iterrows():
-        try:
-            await db.asesor.upsert(
-                where={
-                    'idAsesor': str(row['idAsesor'])
-                },
-                data={
-                    'create': {
-                        'idAsesor': str(row['idAsesor']),
-                        'Asesor': str(row['asesor']),
-                        'createdBy': 'ijfaneite',
-                        'updatedBy': 'ijfaneite',
-                    },
-                    'update': {
-                        'Asesor': str(row['asesor']),
-                        'updatedBy': 'ijfaneite',
-                    }
-                }
-            )
-        except Exception as e:
-            print(f"Error en asesor {row['idAsesor']}: {e}")
-
-    await db.disconnect()
-    print("Asesores importados exitosamente.")
+async def import_asesores():
+    # Carga por lotes (ver cargaMaestros.py)
+    await cargar(['asesores'])
 
 if __name__ == '__main__':
-    asyncio.run(import_asesores())
\ No newline at end of file
+    asyncio.run(import_asesores())